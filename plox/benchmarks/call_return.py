@@ -0,0 +1,49 @@
+"""Times call-heavy Lox programs whose functions return early, on each backend.
+
+Run from the plox directory with ``python -m benchmarks.call_return``, on each checkout to compare.
+"""
+
+from benchmarks.suite import script_arguments, time_programs
+
+PROGRAMS = {
+    "fib": """
+fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+print fib({n});
+""",
+    "nested": """
+fun first(limit) {
+  var i = 0;
+  while (true) {
+    {
+      var j = i * 3;
+      if (j > limit) { return j; }
+    }
+    i = i + 1;
+  }
+}
+var total = 0;
+var k = 0;
+while (k < {n} * 1000) {
+  total = total + first(k - k + 4);
+  k = k + 1;
+}
+print total;
+""",
+}
+
+
+def main() -> None:
+    parser = script_arguments(__doc__)
+    parser.add_argument("--n", type=int, default=22, help="fib argument; the nested program makes n * 1000 calls")
+    args = parser.parse_args()
+
+    sources = {name: template.replace("{n}", str(args.n)) for name, template in PROGRAMS.items()}
+    for backend, name, best in time_programs(sources, args):
+        print(f"{backend:<10} {name:<8} {best:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measures the memory kept alive by Lox closures created in a loop, on each backend.
+
+Run from the plox directory with ``python -m benchmarks.closure_memory``. Each closure refers to one small variable of
+a call that also holds a large local; while closures kept the whole environment chain alive, every one of them kept
+its large local too.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import tracemalloc
+
+from lox.main import BACKENDS, run
+
+PROGRAM = """
+class Node {
+  init(value, next) {
+    this.value = value;
+    this.next = next;
+  }
+}
+
+fun make(i) {
+  var big = "";
+  var j = 0;
+  while (j < {size}) {
+    big = big + "x";
+    j = j + 1;
+  }
+  var small = i;
+  fun get() { return small; }
+  return get;
+}
+
+var kept = nil;
+for (var i = 0; i < {count}; i = i + 1) {
+  kept = Node(make(i), kept);
+}
+print kept.value();
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="closures kept alive")
+    parser.add_argument("--size", type=int, default=200, help="length of the large local in each call")
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="may be repeated (default: all)")
+    args = parser.parse_args()
+
+    source = PROGRAM.replace("{count}", str(args.count)).replace("{size}", str(args.size))
+    for backend in args.backend or BACKENDS:
+        interpreter = BACKENDS[backend]()
+        output = io.StringIO()
+        gc.collect()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(output):
+            run(source, interpreter)
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert output.getvalue() == f"{args.count - 1}\n", output.getvalue()
+        print(f"{backend:<10} {args.count} closures  {retained / 1024:10.1f} KiB retained")
+        del interpreter
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Measures memory per instance and field access time for a million small `LoxInstance` objects.
+
+Every instance gets the same fields in the same order, as an initializer would set them. Run from the plox directory
+with ``python -m benchmarks.instance_memory``.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from lox.lox_class import LoxClass, LoxInstance
+from lox.token_type import TokenType
+from lox.tokens import Token
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instances", type=int, default=1_000_000)
+    parser.add_argument("--fields", type=int, default=3)
+    args = parser.parse_args()
+
+    klass = LoxClass("Point", {})
+    names = [Token(TokenType.IDENTIFIER, f"f{n}", None, 1) for n in range(args.fields)]
+    instances: list[LoxInstance] = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(args.instances):
+        instance = LoxInstance(klass)
+        for name in names:
+            instance.set(name, float(i))
+        instances.append(instance)
+    allocate = time.perf_counter() - start
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for instance in instances:
+        for name in names:
+            instance.get(name)
+    read = time.perf_counter() - start
+
+    # The float field values are counted too; they cost the same with any layout.
+    print(f"{args.instances:,} instances with {args.fields} fields")
+    print(f"memory:   {allocated / 2**20:8.1f} MiB  ({allocated / args.instances:.0f} bytes per instance)")
+    print(f"allocate: {allocate:8.2f} s")
+    print(f"read:     {read:8.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Times the per-iteration overhead of an empty-bodied Lox `for` loop, next to the equivalent `while` loop.
+
+Run from the plox directory with ``python -m benchmarks.loop_overhead``. Before `for` had a node of its own it was
+desugared into a block around a `while`, so both loops cost the same; compare the figures on an older checkout.
+"""
+
+from benchmarks.suite import script_arguments, time_programs
+
+LOOPS = {
+    "for": """
+fun loop() {
+  for (var i = 0; i < {count}; i = i + 1) {}
+}
+loop();
+""",
+    "while": """
+fun loop() {
+  var i = 0;
+  while (i < {count}) {
+    i = i + 1;
+  }
+}
+loop();
+""",
+}
+
+
+def main() -> None:
+    parser = script_arguments(__doc__)
+    parser.add_argument("--n", type=int, default=1_000_000, help="iterations per loop")
+    args = parser.parse_args()
+
+    sources = {name: program.replace("{count}", str(args.n)) for name, program in LOOPS.items()}
+    for backend, name, best in time_programs(sources, args):
+        print(f"{backend:<10} {name:<6} {best:8.3f} s  {best / args.n * 1e9:8.1f} ns/iteration")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measures memory per token and per AST node when scanning and parsing a large generated program.
+
+Run from the plox directory with ``python -m benchmarks.memory_footprint``.
+"""
+
+import argparse
+import dataclasses
+import tracemalloc
+from typing import Any
+
+from lox.parser import Parser
+from lox.scanner import Scanner
+
+
+def build_source(functions: int) -> str:
+    chunks = []
+    for n in range(functions):
+        chunks.append(
+            f"fun f{n}(a, b) {{\n"
+            f"  var total = a * {n} + b;\n"
+            f"  while (total < 100) {{\n"
+            f'    if (total > 50) print "big"; else total = total + a / 2;\n'
+            f"  }}\n"
+            f"  return total;\n"
+            f"}}\n"
+            f"print f{n}(1, 2);\n"
+        )
+    return "".join(chunks)
+
+
+def count_nodes(node: Any) -> int:
+    if isinstance(node, list):
+        return sum(count_nodes(child) for child in node)
+    if not dataclasses.is_dataclass(node) or node.__class__.__name__ == "Token":
+        return 0
+    return 1 + sum(count_nodes(getattr(node, field.name)) for field in dataclasses.fields(node))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, default=5000, help="functions in the generated program")
+    args = parser.parse_args()
+    source = build_source(args.functions)
+
+    tracemalloc.start()
+    tokens = list(Scanner(source))
+    after_scan = tracemalloc.get_traced_memory()[0]
+    statements = Parser(tokens).parse()
+    after_parse = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    nodes = count_nodes(statements)
+    print(f"{len(tokens)} tokens: {after_scan / len(tokens):.0f} bytes per token")
+    print(f"{nodes} nodes: {(after_parse - after_scan) / nodes:.0f} bytes per node")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Times local variable resolution on assignment-heavy code with large right-hand sides.
+
+Run from the plox directory with ``python -m benchmarks.resolution_lookup``.
+"""
+
+import argparse
+import time
+
+from lox.interpreter import Interpreter
+from lox.main import run
+
+
+def build_source(terms: int, iterations: int) -> str:
+    lines = ["fun bench() {", "  var a;", "  var b = 2;", "  var c = 3;", "  var d;", "  var e;", "  var i = 0;"]
+    lines.append(f"  while (i < {iterations}) {{")
+    for target in "ade":
+        rhs = " + ".join(f"(b * {n} - c)" for n in range(terms))
+        lines.append(f"    {target} = {rhs};")
+    lines += ["    i = i + 1;", "  }", "  return a;", "}", "bench();"]
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=50, help="terms on each right-hand side")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = build_source(args.terms, args.iterations)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run(source, Interpreter())
+        timings.append(time.perf_counter() - start)
+
+    assignments = 3 * args.iterations
+    print(f"best of {args.repeat}: {min(timings):.3f}s, {min(timings) / assignments * 1e6:.1f}us per assignment")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Compares tokens per second of `Scanner` and `FastScanner` on a large generated program.
+
+Run from the plox directory with ``python -m benchmarks.scanner_throughput``.
+"""
+
+import argparse
+import time
+
+from benchmarks.memory_footprint import build_source
+from lox.scanner import FastScanner, Scanner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, default=5000, help="functions in the generated program")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    source = build_source(args.functions)
+
+    streams = {}
+    for scanner in (Scanner, FastScanner):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            tokens = list(scanner(source))
+            best = min(best, time.perf_counter() - start)
+        streams[scanner.__name__] = tokens
+        print(f"{scanner.__name__:<12} {len(tokens) / best:>12,.0f} tokens/s ({len(source) / best / 1e6:.1f} MB/s)")
+
+    assert streams["Scanner"] == streams["FastScanner"], "token streams differ"
+
+
+if __name__ == "__main__":
+    main()
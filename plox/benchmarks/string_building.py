@@ -0,0 +1,34 @@
+"""Times building a large Lox string with `s = s + piece;` in a loop, on each backend.
+
+Run from the plox directory with ``python -m benchmarks.string_building``. Before strings were concatenated lazily
+this was quadratic in the final size; try ``--megabytes 1`` on an older checkout.
+"""
+
+from benchmarks.suite import script_arguments, time_programs
+
+PROGRAM = """
+var piece = "{piece}";
+var s = "";
+var i = 0;
+while (i < {count}) {
+  s = s + piece;
+  i = i + 1;
+}
+print s == s + "";
+"""
+
+
+def main() -> None:
+    parser = script_arguments(__doc__)
+    parser.add_argument("--megabytes", type=float, default=10, help="size of the final string")
+    parser.add_argument("--piece", type=int, default=100, help="characters appended per iteration")
+    args = parser.parse_args()
+
+    count = int(args.megabytes * 1_000_000) // args.piece
+    source = PROGRAM.replace("{piece}", "x" * args.piece).replace("{count}", str(count))
+    for backend, _, best in time_programs({"concat": source}, args, expected="True\n"):
+        print(f"{backend:<10} {count} x {args.piece} chars  {best:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
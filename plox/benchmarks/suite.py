@@ -0,0 +1,133 @@
+"""Runs the Lox benchmark suite in benchmarks/lox and compares the timings with a stored baseline.
+
+Run from the plox directory, e.g. ``python -m benchmarks.suite --output before.json`` on one checkout and
+``python -m benchmarks.suite --baseline before.json`` on another. Each program is run through ``lox.main.run`` with a
+fresh interpreter, after untimed warmup runs; the fastest of the timed runs is compared, since on a shared machine
+noise only ever makes a run slower. The exit status is 1 if any program regressed by more than the threshold.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from lox.cache import plox_version
+from lox.errors import handler
+from lox.main import BACKENDS, run
+
+PROGRAMS = Path(__file__).parent / "lox"
+
+
+def time_program(source: str, backend: str) -> tuple[float, str]:
+    interpreter = BACKENDS[backend]()
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        run(source, interpreter)
+    elapsed = time.perf_counter() - start
+    if handler.had_error or handler.had_runtime_error:
+        raise SystemExit(f"benchmark failed on {backend}:\n{output.getvalue()}")
+    return elapsed, output.getvalue()
+
+
+def script_arguments(doc: str) -> argparse.ArgumentParser:
+    """The command line shared by the standalone benchmark scripts, which add their own sizes to it."""
+    parser = argparse.ArgumentParser(description=doc.splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="may be repeated (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser
+
+
+def time_programs(
+    programs: dict[str, str], args: argparse.Namespace, expected: str | None = None
+) -> Iterator[tuple[str, str, float]]:
+    """Yields the backend, name and fastest of `args.repeat` timings of each program on each backend in `args`, failing
+    if a run prints anything but `expected` when that is given."""
+    for backend in args.backend or BACKENDS:
+        for name, source in programs.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                elapsed, output = time_program(source, backend)
+                if expected is not None and output != expected:
+                    raise SystemExit(f"{name} printed {output!r} on {backend}, expected {expected!r}")
+                best = min(best, elapsed)
+            yield backend, name, best
+
+
+def run_suite(programs: list[Path], backends: list[str], warmup: int, repeat: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for backend in backends:
+        for path in programs:
+            source = path.read_text(encoding="utf-8")
+            for _ in range(warmup):
+                time_program(source, backend)
+            runs = [time_program(source, backend)[0] for _ in range(repeat)]
+            results[f"{backend}/{path.stem}"] = {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+            print(f"{backend:<10} {path.stem:<16} {min(runs):8.3f} s  (median {statistics.median(runs):.3f} s)")
+    return results
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline':>9} {'current':>9} {'change':>8}")
+    for name, result in results.items():
+        if (before := baseline.get(name)) is None:
+            print(f"{name:<28} {'-':>9} {result['min']:8.3f}s {'new':>8}")
+            continue
+        change = result["min"] / before["min"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {before['min']:8.3f}s {result['min']:8.3f}s {change:+8.1%}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("programs", nargs="*", help="names of programs to run (default: all)")
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="may be repeated (default: tree)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs before measuring")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per program")
+    parser.add_argument("--output", metavar="FILE", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", type=Path, help="JSON results of an earlier run to compare with")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="flag programs that got slower by more than this fraction"
+    )
+    args = parser.parse_args()
+
+    programs = sorted(PROGRAMS.glob("*.lox"))
+    if args.programs:
+        unknown = set(args.programs) - {path.stem for path in programs}
+        if unknown:
+            parser.error(f"unknown programs: {', '.join(sorted(unknown))}")
+        programs = [path for path in programs if path.stem in args.programs]
+
+    results = run_suite(programs, args.backend or ["tree"], args.warmup, args.repeat)
+
+    if args.output is not None:
+        report = {
+            "plox": plox_version(),
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        if regressions := compare(results, baseline, args.threshold):
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import pickle
+import sys
+from importlib import metadata
+from pathlib import Path
+
+import lox.expr as e
+import lox.stmt as s
+from lox.environment import FunctionLayout
+
+# Bump whenever the AST classes or the meaning of the resolution table change, so stale entries are never loaded.
+CACHE_FORMAT = 5
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+Program = tuple[
+    list[s.Stmt | None],
+    dict[e.Expr, tuple[int, int]],
+    dict[s.Block | s.For, bool],
+    set[s.Var | s.Function | s.Class],
+    dict[s.Function, FunctionLayout],
+    list[str],
+]
+# How many items a `Program` has, so that `load` can reject a pickle of anything else.
+PROGRAM_FIELDS = 6
+
+
+def plox_version() -> str:
+    try:
+        return metadata.version("plox")
+    except metadata.PackageNotFoundError:
+        return "0.0.0"
+
+
+@functools.cache
+def source_digest() -> str:
+    """Hash of the `lox` package's sources, so that an edited checkout never loads entries pickled by another one."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def default_directory() -> Path:
+    if directory := os.environ.get("PLOX_CACHE_DIR"):
+        return Path(directory)
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "plox"
+
+
+class ProgramCache:
+    """Parsed and resolved programs on disk, in the spirit of `__pycache__`.
+
+    Entries are keyed by the source's hash together with the plox version, the hash of plox's own sources, the cache
+    format and the Python version, so an edited script or an upgraded interpreter simply misses. Once the directory
+    grows past `max_bytes`, the least recently used entries are removed; a hit refreshes the entry's modification time.
+    """
+
+    SUFFIX = ".loxc"
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = default_directory() if directory is None else directory
+        self.max_bytes = max_bytes
+        python = f"{sys.version_info.major}.{sys.version_info.minor}"
+        self.__salt = f"{plox_version()}:{source_digest()}:{CACHE_FORMAT}:{python}".encode()
+
+    def key(self, path: str | Path, variant: str = "") -> str:
+        with open(path, "rb") as file:
+            digest = hashlib.file_digest(file, "sha256")
+        digest.update(self.__salt)
+        digest.update(variant.encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Program | None:
+        entry = self.__entry(key)
+        try:
+            with open(entry, "rb") as file:
+                program: Program = pickle.load(file)
+            if not isinstance(program, tuple) or len(program) != PROGRAM_FIELDS:
+                raise pickle.UnpicklingError(f"not a cached program: {entry}")
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Unpickling a damaged or foreign entry can fail in almost any way; it is only a cache.
+            self.__remove(entry)
+            return None
+        return program
+
+    def store(
+        self,
+        key: str,
+        statements: list[s.Stmt | None],
+        locals_: dict[e.Expr, tuple[int, int]],
+        flat_blocks: dict[s.Block | s.For, bool],
+        captured: set[s.Var | s.Function | s.Class],
+        layouts: dict[s.Function, FunctionLayout],
+        global_names: list[str],
+    ) -> None:
+        entry = self.__entry(key)
+        temporary = entry.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            payload = pickle.dumps(
+                (statements, locals_, flat_blocks, captured, layouts, global_names), protocol=pickle.HIGHEST_PROTOCOL
+            )
+            if len(payload) > self.max_bytes:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary.write_bytes(payload)
+            os.replace(temporary, entry)
+        except (OSError, RecursionError, pickle.PicklingError):
+            self.__remove(temporary)
+            return
+        self.__evict()
+
+    def clear(self) -> None:
+        for entry, _ in self.__entries():
+            self.__remove(entry)
+
+    def __evict(self) -> None:
+        entries = sorted(self.__entries(), key=lambda item: item[1].st_mtime_ns)
+        total = sum(stat.st_size for _, stat in entries)
+        for entry, stat in entries:
+            if total <= self.max_bytes:
+                break
+            self.__remove(entry)
+            total -= stat.st_size
+
+    def __entries(self) -> list[tuple[Path, os.stat_result]]:
+        entries = []
+        try:
+            for entry in self.directory.glob(f"*{self.SUFFIX}"):
+                try:
+                    entries.append((entry, entry.stat()))
+                except OSError:
+                    continue
+        except OSError:
+            pass
+        return entries
+
+    def __entry(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    @staticmethod
+    def __remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import math
+from array import array
+from enum import IntEnum, unique
+from typing import Any
+
+from lox.tokens import Token
+
+
+@unique
+class OpCode(IntEnum):
+    CONSTANT = 0
+    NIL = 1
+    TRUE = 2
+    FALSE = 3
+    POP = 4
+    GET_LOCAL = 5
+    SET_LOCAL = 6
+    GET_GLOBAL = 7
+    DEFINE_GLOBAL = 8
+    SET_GLOBAL = 9
+    GET_UPVALUE = 10
+    SET_UPVALUE = 11
+    GET_PROPERTY = 12
+    SET_PROPERTY = 13
+    EQUAL = 14
+    NOT_EQUAL = 15
+    GREATER = 16
+    GREATER_EQUAL = 17
+    LESS = 18
+    LESS_EQUAL = 19
+    ADD = 20
+    SUBTRACT = 21
+    MULTIPLY = 22
+    DIVIDE = 23
+    NOT = 24
+    NEGATE = 25
+    PRINT = 26
+    JUMP = 27
+    JUMP_IF_FALSE = 28
+    LOOP = 29
+    CHECK_CALLABLE = 30
+    CHECK_INSTANCE = 31
+    CALL = 32
+    CLOSURE = 33
+    CLOSE_UPVALUE = 34
+    RETURN = 35
+    CLASS = 36
+    GET_CALLEE = 37
+    TAIL_CALL = 38
+    INVOKE = 39
+    TAIL_INVOKE = 40
+
+
+class Chunk:
+    """A flat code buffer with its constant pool.
+
+    Every opcode and every operand occupies one word of `code`. Instructions that can fail at runtime record the
+    source token they were compiled from in `tokens`, keyed by the offset of the opcode, so runtime errors report the
+    same line as the tree-walking interpreter.
+    """
+
+    def __init__(self) -> None:
+        self.code = array("I")
+        self.constants: list[Any] = []
+        self.tokens: dict[int, Token] = {}
+        self.__constant_indexes: dict[tuple[type, Any, float], int] = {}
+
+    def write(self, word: int) -> int:
+        self.code.append(word)
+        return len(self.code) - 1
+
+    def add_constant(self, value: Any) -> int:
+        if isinstance(value, (float, str)):
+            # 0.0 == -0.0, so the sign is part of the key; `print -0;` must not print the pooled `0`.
+            key = (type(value), value, math.copysign(1.0, value) if isinstance(value, float) else 1.0)
+            if (index := self.__constant_indexes.get(key)) is None:
+                index = self.__constant_indexes[key] = len(self.constants)
+                self.constants.append(value)
+            return index
+
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def disassemble(self, name: str) -> str:
+        lines = [f"== {name} =="]
+        offset = 0
+        while offset < len(self.code):
+            op = OpCode(self.code[offset])
+            operands = OPERAND_COUNTS.get(op, 0)
+            args = list(self.code[offset + 1 : offset + 1 + operands])
+            if op == OpCode.CLOSURE:
+                function = self.constants[args[0]]
+                args += list(self.code[offset + 2 : offset + 2 + 2 * function.upvalue_count])
+                operands += 2 * function.upvalue_count
+            text = f"{offset:04d} {op.name:<16}{' '.join(map(str, args))}"
+            if op in CONSTANT_OPERAND:
+                text += f" '{self.constants[args[0]]}'"
+            lines.append(text)
+            offset += 1 + operands
+        return "\n".join(lines)
+
+
+OPERAND_COUNTS = {
+    OpCode.CONSTANT: 1,
+    OpCode.GET_LOCAL: 1,
+    OpCode.SET_LOCAL: 1,
+    OpCode.GET_GLOBAL: 1,
+    OpCode.DEFINE_GLOBAL: 1,
+    OpCode.SET_GLOBAL: 1,
+    OpCode.GET_UPVALUE: 1,
+    OpCode.SET_UPVALUE: 1,
+    OpCode.GET_PROPERTY: 1,
+    OpCode.GET_CALLEE: 1,
+    OpCode.SET_PROPERTY: 1,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.LOOP: 1,
+    OpCode.CALL: 1,
+    OpCode.TAIL_CALL: 1,
+    OpCode.INVOKE: 1,
+    OpCode.TAIL_INVOKE: 1,
+    OpCode.CLOSURE: 1,
+    OpCode.CLASS: 2,
+}
+
+CONSTANT_OPERAND = {
+    OpCode.CONSTANT,
+    OpCode.GET_GLOBAL,
+    OpCode.DEFINE_GLOBAL,
+    OpCode.SET_GLOBAL,
+    OpCode.GET_PROPERTY,
+    OpCode.GET_CALLEE,
+    OpCode.SET_PROPERTY,
+    OpCode.CLOSURE,
+    OpCode.CLASS,
+}
+
+
+class FunctionProto:
+    def __init__(self, name: str, arity: int = 0, is_initializer: bool = False) -> None:
+        self.name = name
+        self.arity = arity
+        self.is_initializer = is_initializer
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __str__(self) -> str:
+        if self.name == "":
+            return "<script>"
+        return f"<fn {self.name}>"
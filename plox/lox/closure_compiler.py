@@ -0,0 +1,568 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import lox.expr as e
+import lox.stmt as s
+from lox.environment import CELL, GLOBAL, LOCAL, UNDEFINED, Cell, Environment, FunctionLayout, undefined
+from lox.errors import LoxRuntimeError, handler
+from lox.interpreter import Interpreter
+from lox.lox_callable import LoxCallable
+from lox.lox_class import LoxClass, LoxInstance, PropertyCache
+from lox.lox_function import FrameFunction
+from lox.runtime import STRING_TYPES, concat, is_equal, stringify
+from lox.token_type import TokenType
+from lox.tokens import Token
+
+Evaluator = Callable[[Any], Any]
+# Executors return None when the statement completes normally and a 1-tuple holding the value on `return`.
+Executor = Callable[[Any], tuple[Any] | None]
+
+
+class CompiledFunction(FrameFunction):
+    def __init__(
+        self,
+        name: str,
+        arity: int,
+        body: list[Executor],
+        layout: FunctionLayout,
+        cells: tuple[Cell, ...],
+        is_initializer: bool,
+        receiver: LoxInstance | None = None,
+    ) -> None:
+        super().__init__(arity, layout, cells, is_initializer, receiver)
+        self.name = name
+        self.body = body
+
+    def call_frame(self, interpreter: Interpreter, values: list[Any]) -> Any:
+        receiver = values[0]
+        environment = self._enter(interpreter, values)
+        completion = None
+        for run in self.body:
+            if (completion := run(environment)) is not None:
+                break
+        return self._leave(interpreter, receiver, completion)
+
+    def bind(self, instance: LoxInstance) -> CompiledFunction:
+        return CompiledFunction(
+            self.name, self.arity, self.body, self.layout, self.cells, self.is_initializer, instance
+        )
+
+    def __str__(self) -> str:
+        return f"<fn {self.name}>"
+
+
+class ClosureCompiler(e.Visitor[Evaluator], s.Visitor[Executor]):
+    """Turns a resolved program into a tree of Python closures.
+
+    Every node is visited once, at compile time. The closures it produces call their children directly, so evaluation
+    no longer pays for `accept` dispatch or for matching on the operator type.
+    """
+
+    def __init__(self, interpreter: Interpreter) -> None:
+        self.__interpreter = interpreter
+        self.__scope_depth = 0
+
+    def compile(self, statements: list[s.Stmt | None] | list[s.Stmt]) -> list[Executor]:
+        return [stmt.accept(self) for stmt in statements if stmt is not None]
+
+    def __scoped(self, statements: list[s.Stmt | None] | list[s.Stmt]) -> list[Executor]:
+        self.__scope_depth += 1
+        try:
+            return self.compile(statements)
+        finally:
+            self.__scope_depth -= 1
+
+    def __function(self, stmt: s.Function, is_initializer: bool) -> Evaluator:
+        name, arity, body = stmt.name.lexeme, len(stmt.params), self.__scoped(stmt.body)
+        layout = self.__interpreter.layouts[stmt]
+        if not layout.free:
+            return lambda env: CompiledFunction(name, arity, body, layout, (), is_initializer)
+        return lambda env: CompiledFunction(name, arity, body, layout, layout.capture(env), is_initializer)
+
+    def __define(self, name: Token, value: Evaluator | None) -> Executor:
+        if self.__scope_depth == 0:
+            cell = self.__interpreter.globals.cell(name.lexeme)
+
+            def define_global(env: Environment) -> None:
+                cell.value = None if value is None else value(env)
+
+            return define_global
+
+        if value is None:
+            return lambda env: env.define(None)
+        return lambda env: env.define(value(env))
+
+    def visit_expression(self, stmt: s.Expression) -> Executor:
+        expression = stmt.expression.accept(self)
+
+        def run(env: Environment) -> None:
+            expression(env)
+
+        return run
+
+    def visit_print(self, stmt: s.Print) -> Executor:
+        expression = stmt.expression.accept(self)
+        write_line = self.__interpreter.output.write_line
+
+        def run(env: Environment) -> None:
+            write_line(stringify(expression(env)))
+
+        return run
+
+    def __define_declared(self, stmt: s.Var | s.Function | s.Class, value: Evaluator | None) -> Executor:
+        if stmt not in self.__interpreter.captured:
+            return self.__define(stmt.name, value)
+
+        # A captured variable is never a global. Its cell is defined before the value is computed, so that a function
+        # or a class can capture the variable holding itself.
+        def define_cell(env: Environment) -> None:
+            cell = Cell()
+            env.define(cell)
+            if value is not None:
+                cell.value = value(env)
+
+        return define_cell
+
+    def visit_var(self, stmt: s.Var) -> Executor:
+        return self.__define_declared(stmt, None if stmt.initializer is None else stmt.initializer.accept(self))
+
+    def visit_block(self, stmt: s.Block) -> Executor:
+        statements = self.__scoped(stmt.statments)
+
+        if (declares := self.__interpreter.flat_blocks.get(stmt)) is not None:
+
+            def run_flat(env: Environment) -> tuple[Any] | None:
+                values = env.values
+                mark = len(values)
+                for statement in statements:
+                    if (completion := statement(env)) is not None:
+                        return completion
+                if declares:
+                    del values[mark:]
+                return None
+
+            return run_flat
+
+        def run(env: Environment) -> tuple[Any] | None:
+            inner = Environment()
+            for statement in statements:
+                if (completion := statement(inner)) is not None:
+                    return completion
+            return None
+
+        return run
+
+    def visit_if(self, stmt: s.If) -> Executor:
+        condition = stmt.condition.accept(self)
+        then_branch = stmt.then_branch.accept(self)
+        if stmt.else_branch is None:
+
+            def run_then(env: Environment) -> tuple[Any] | None:
+                if (value := condition(env)) is not None and value is not False:
+                    return then_branch(env)
+                return None
+
+            return run_then
+
+        else_branch = stmt.else_branch.accept(self)
+
+        def run(env: Environment) -> tuple[Any] | None:
+            if (value := condition(env)) is not None and value is not False:
+                return then_branch(env)
+            return else_branch(env)
+
+        return run
+
+    def visit_while(self, stmt: s.While) -> Executor:
+        condition = stmt.condition.accept(self)
+        body = stmt.body.accept(self)
+
+        def run(env: Environment) -> tuple[Any] | None:
+            while (value := condition(env)) is not None and value is not False:
+                if (completion := body(env)) is not None:
+                    return completion
+            return None
+
+        return run
+
+    def visit_for(self, stmt: s.For) -> Executor:
+        scoped = isinstance(stmt.initializer, s.Var)
+        if scoped:
+            self.__scope_depth += 1
+        try:
+            initializer = None if stmt.initializer is None else stmt.initializer.accept(self)
+            condition = None if stmt.condition is None else stmt.condition.accept(self)
+            body = stmt.body.accept(self)
+            increment = None if stmt.increment is None else stmt.increment.accept(self)
+        finally:
+            if scoped:
+                self.__scope_depth -= 1
+
+        def loop(env: Environment) -> tuple[Any] | None:
+            while condition is None or ((value := condition(env)) is not None and value is not False):
+                if (completion := body(env)) is not None:
+                    return completion
+                if increment is not None:
+                    increment(env)
+            return None
+
+        if not scoped:
+
+            def run(env: Environment) -> tuple[Any] | None:
+                if initializer is not None:
+                    initializer(env)
+                return loop(env)
+
+            return run
+
+        if self.__interpreter.flat_blocks.get(stmt) is None:
+
+            def run_scoped(env: Environment) -> tuple[Any] | None:
+                inner = Environment()
+                initializer(inner)  # type: ignore[misc]
+                return loop(inner)
+
+            return run_scoped
+
+        def run_flat(env: Environment) -> tuple[Any] | None:
+            values = env.values
+            mark = len(values)
+            initializer(env)  # type: ignore[misc]
+            if (completion := loop(env)) is not None:
+                return completion
+            del values[mark:]
+            return None
+
+        return run_flat
+
+    def visit_function(self, stmt: s.Function) -> Executor:
+        return self.__define_declared(stmt, self.__function(stmt, False))
+
+    def visit_return(self, stmt: s.Return) -> Executor:
+        if stmt.value is None:
+            return lambda env: (None,)
+
+        value = stmt.value.accept(self)
+        return lambda env: (value(env),)
+
+    def visit_class(self, stmt: s.Class) -> Executor:
+        name = stmt.name.lexeme
+        methods = [
+            (method.name.lexeme, self.__function(method, method.name.lexeme == "init")) for method in stmt.methods
+        ]
+
+        def klass(env: Environment) -> LoxClass:
+            return LoxClass(name, {method_name: method(env) for method_name, method in methods})
+
+        return self.__define_declared(stmt, klass)
+
+    def visit_literal(self, expr: e.Literal) -> Evaluator:
+        value = expr.value
+        return lambda env: value
+
+    def visit_grouping(self, expr: e.Grouping) -> Evaluator:
+        return expr.expression.accept(self)
+
+    def visit_unary(self, expr: e.Unary) -> Evaluator:
+        right = expr.right.accept(self)
+        operator = expr.operator
+
+        match operator.type_:
+            case TokenType.BANG:
+
+                def bang(env: Environment) -> bool:
+                    value = right(env)
+                    return value is None or value is False
+
+                return bang
+            case TokenType.MINUS:
+
+                def negate(env: Environment) -> float:
+                    value = right(env)
+                    if isinstance(value, float):
+                        return -value
+                    raise LoxRuntimeError(operator, "Operand must be a number.")
+
+                return negate
+
+        return lambda env: None
+
+    def visit_binary(self, expr: e.Binary) -> Evaluator:  # pylint: disable=too-many-return-statements
+        left = expr.left.accept(self)
+        right = expr.right.accept(self)
+        operator = expr.operator
+
+        match operator.type_:
+            case TokenType.PLUS:
+
+                def plus(env: Environment) -> Any:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a + b
+                    if isinstance(a, STRING_TYPES) and isinstance(b, STRING_TYPES):
+                        return concat(a, b)
+                    raise LoxRuntimeError(operator, "Operands must be two numbers or two strings.")
+
+                return plus
+            case TokenType.MINUS:
+
+                def minus(env: Environment) -> float:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a - b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return minus
+            case TokenType.STAR:
+
+                def star(env: Environment) -> float:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a * b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return star
+            case TokenType.SLASH:
+
+                def slash(env: Environment) -> float:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a / b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return slash
+            case TokenType.LESS:
+
+                def less(env: Environment) -> bool:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a < b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return less
+            case TokenType.LESS_EQUAL:
+
+                def less_equal(env: Environment) -> bool:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a <= b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return less_equal
+            case TokenType.GREATER:
+
+                def greater(env: Environment) -> bool:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a > b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return greater
+            case TokenType.GREATER_EQUAL:
+
+                def greater_equal(env: Environment) -> bool:
+                    a = left(env)
+                    b = right(env)
+                    if isinstance(a, float) and isinstance(b, float):
+                        return a >= b
+                    raise LoxRuntimeError(operator, "Operands must be numbers.")
+
+                return greater_equal
+            case TokenType.EQUAL_EQUAL:
+                return lambda env: is_equal(left(env), right(env))
+            case TokenType.BANG_EQUAL:
+                return lambda env: not is_equal(left(env), right(env))
+
+        def unknown(env: Environment) -> None:
+            left(env)
+            right(env)
+
+        return unknown
+
+    def visit_logical(self, expr: e.Logical) -> Evaluator:
+        left = expr.left.accept(self)
+        right = expr.right.accept(self)
+
+        if expr.operator.type_ == TokenType.OR:
+
+            def or_(env: Environment) -> Any:
+                if (value := left(env)) is not None and value is not False:
+                    return value
+                return right(env)
+
+            return or_
+
+        def and_(env: Environment) -> Any:
+            if (value := left(env)) is None or value is False:
+                return value
+            return right(env)
+
+        return and_
+
+    def __variable(self, expr: e.Expr, name: Token) -> Evaluator:
+        kind, index = self.__interpreter.locals[expr]
+        if kind == LOCAL:
+            return lambda env: env.values[index]
+        if kind == GLOBAL:
+            cell = self.__interpreter.globals.cells[index]
+
+            def get_global(env: Environment) -> Any:
+                if (value := cell.value) is UNDEFINED:
+                    raise undefined(name)
+                return value
+
+            return get_global
+        if kind == CELL:
+            return lambda env: env.values[index].value
+        return lambda env: env.cells[index].value
+
+    def visit_variable(self, expr: e.Variable) -> Evaluator:
+        return self.__variable(expr, expr.name)
+
+    def visit_assign(self, expr: e.Assign) -> Evaluator:
+        value = expr.value.accept(self)
+        name = expr.name
+
+        kind, index = self.__interpreter.locals[expr]
+        if kind == GLOBAL:
+            cell = self.__interpreter.globals.cells[index]
+
+            def assign_global(env: Environment) -> Any:
+                result = value(env)
+                if cell.value is UNDEFINED:
+                    raise undefined(name)
+                cell.value = result
+                return result
+
+            return assign_global
+
+        if kind == LOCAL:
+
+            def assign(env: Environment) -> Any:
+                env.values[index] = result = value(env)
+                return result
+
+            return assign
+
+        if kind == CELL:
+
+            def assign_cell(env: Environment) -> Any:
+                env.values[index].value = result = value(env)
+                return result
+
+            return assign_cell
+
+        def assign_free(env: Environment) -> Any:
+            env.cells[index].value = result = value(env)
+            return result
+
+        return assign_free
+
+    def visit_call(self, expr: e.Call) -> Evaluator:
+        arguments = [argument.accept(self) for argument in expr.arguments]
+        count = len(arguments)
+        paren = expr.paren
+        interpreter = self.__interpreter
+
+        def start(function: Any) -> list[Any]:
+            # A compiled function is called on a frame holding its receiver in slot 0, then the arguments.
+            if type(function) is CompiledFunction:  # pylint: disable=unidiomatic-typecheck
+                return [function.receiver]
+            if isinstance(function, LoxCallable):
+                return []
+            raise LoxRuntimeError(paren, "Can only call functions and classes.")
+
+        def invoke(function: Any, values: list[Any], env: Environment) -> Any:
+            for argument in arguments:
+                values.append(argument(env))
+            if count != function.arity:
+                raise LoxRuntimeError(paren, f"Expected {function.arity} arguments but got {count}.")
+            try:
+                if type(function) is CompiledFunction:  # pylint: disable=unidiomatic-typecheck
+                    return function.call_frame(interpreter, values)
+                return function(interpreter, values)
+            except RecursionError:
+                raise LoxRuntimeError(paren, "Stack overflow.") from None
+
+        if not isinstance(expr.callee, e.Get):
+            callee = expr.callee.accept(self)
+
+            def call(env: Environment) -> Any:
+                function = callee(env)
+                return invoke(function, start(function), env)
+
+            return call
+
+        # `obj.m(x)` passes `obj` to the method itself, so no bound method is made.
+        obj = expr.callee.obj.accept(self)
+        name = expr.callee.name
+        cache = PropertyCache(name)
+        method_for, get = cache.method_for, cache.get
+
+        def call_method(env: Environment) -> Any:
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise LoxRuntimeError(name, "Only instances have properties.")
+            if (method := method_for(instance)) is not None:
+                return invoke(method, [instance], env)
+            function = get(instance)
+            return invoke(function, start(function), env)
+
+        return call_method
+
+    def visit_get(self, expr: e.Get) -> Evaluator:
+        obj = expr.obj.accept(self)
+        name = expr.name
+        lookup = PropertyCache(name).get
+
+        def get(env: Environment) -> Any:
+            instance = obj(env)
+            if isinstance(instance, LoxInstance):
+                return lookup(instance)
+            raise LoxRuntimeError(name, "Only instances have properties.")
+
+        return get
+
+    def visit_set(self, expr: e.Set) -> Evaluator:
+        obj = expr.obj.accept(self)
+        value = expr.value.accept(self)
+        name = expr.name
+        store = PropertyCache(name).set
+
+        def set_(env: Environment) -> Any:
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise LoxRuntimeError(name, "Only instances have fields.")
+            result = value(env)
+            store(instance, result)
+            return result
+
+        return set_
+
+    def visit_this(self, expr: e.This) -> Evaluator:
+        return self.__variable(expr, expr.keyword)
+
+
+class ClosureInterpreter(Interpreter):
+    """Closure-compilation backend: compiles each program with `ClosureCompiler`, then runs the closures."""
+
+    supports_hooks = False
+
+    def interpret(self, statements: list[s.Stmt | None]) -> None:
+        program = ClosureCompiler(self).compile(statements)
+        try:
+            for run in program:
+                run(self.globals)
+        except LoxRuntimeError as error:
+            self.output.flush()
+            handler.runtime_error(error)
+        finally:
+            self.output.flush()
@@ -0,0 +1,346 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import lox.expr as e
+import lox.stmt as s
+from lox.chunk import Chunk, FunctionProto, OpCode
+from lox.lox_class import PropertyCache
+from lox.resolver import FunctionType
+from lox.token_type import TokenType
+from lox.tokens import Token
+
+BINARY_OPS = {
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+    TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+    TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.SLASH: OpCode.DIVIDE,
+    TokenType.STAR: OpCode.MULTIPLY,
+    TokenType.PLUS: OpCode.ADD,
+}
+
+
+@dataclass
+class _Local:
+    name: str
+    depth: int
+    is_captured: bool = False
+
+
+@dataclass
+class _FunctionState:
+    enclosing: _FunctionState | None
+    function: FunctionProto
+    type_: FunctionType
+    locals: list[_Local] = field(default_factory=list)
+    upvalues: list[tuple[bool, int]] = field(default_factory=list)
+    scope_depth: int = 0
+
+
+class Compiler(e.Visitor[None], s.Visitor[None]):
+    """Lowers a resolved program into bytecode for the `VM`.
+
+    Static errors have already been reported by the `Resolver`, so the compiler assumes its input is well formed.
+    """
+
+    def __init__(self) -> None:
+        self.__state = _FunctionState(None, FunctionProto(""), FunctionType.NONE)
+        self.__state.locals.append(_Local("", 0))
+
+    def compile(self, statements: list[s.Stmt | None]) -> FunctionProto:
+        for stmt in statements:
+            self.__statement(stmt)
+        self.__emit_return()
+        return self.__state.function
+
+    @property
+    def __chunk(self) -> Chunk:
+        return self.__state.function.chunk
+
+    def __emit(self, op: OpCode, *operands: int, token: Token | None = None) -> int:
+        chunk = self.__chunk
+        offset = chunk.write(op)
+        if token is not None:
+            chunk.tokens[offset] = token
+        for operand in operands:
+            chunk.write(operand)
+        return offset
+
+    def __emit_jump(self, op: OpCode) -> int:
+        self.__emit(op, 0)
+        return len(self.__chunk.code) - 1
+
+    def __patch_jump(self, operand: int) -> None:
+        self.__chunk.code[operand] = len(self.__chunk.code)
+
+    def __emit_return(self) -> None:
+        if self.__state.type_ == FunctionType.INITIALIZER:
+            self.__emit(OpCode.GET_LOCAL, 0)
+        else:
+            self.__emit(OpCode.NIL)
+        self.__emit(OpCode.RETURN)
+
+    def __constant(self, value: object) -> int:
+        return self.__chunk.add_constant(value)
+
+    def __statement(self, stmt: s.Stmt | None) -> None:
+        if stmt is not None:
+            stmt.accept(self)
+
+    def __expression(self, expr: e.Expr) -> None:
+        expr.accept(self)
+
+    def __begin_scope(self) -> None:
+        self.__state.scope_depth += 1
+
+    def __end_scope(self) -> None:
+        state = self.__state
+        state.scope_depth -= 1
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            self.__emit(OpCode.CLOSE_UPVALUE if state.locals.pop().is_captured else OpCode.POP)
+
+    def __add_local(self, name: str) -> None:
+        self.__state.locals.append(_Local(name, self.__state.scope_depth))
+
+    def __define_variable(self, name: Token) -> None:
+        if self.__state.scope_depth > 0:
+            self.__add_local(name.lexeme)
+        else:
+            self.__emit(OpCode.DEFINE_GLOBAL, self.__constant(name))
+
+    @staticmethod
+    def __resolve_local(state: _FunctionState, name: str) -> int | None:
+        for slot in range(len(state.locals) - 1, -1, -1):
+            if state.locals[slot].name == name:
+                return slot
+        return None
+
+    def __resolve_upvalue(self, state: _FunctionState, name: str) -> int | None:
+        if state.enclosing is None:
+            return None
+
+        if (local := self.__resolve_local(state.enclosing, name)) is not None:
+            state.enclosing.locals[local].is_captured = True
+            return self.__add_upvalue(state, True, local)
+
+        if (upvalue := self.__resolve_upvalue(state.enclosing, name)) is not None:
+            return self.__add_upvalue(state, False, upvalue)
+
+        return None
+
+    @staticmethod
+    def __add_upvalue(state: _FunctionState, is_local: bool, index: int) -> int:
+        if (is_local, index) in state.upvalues:
+            return state.upvalues.index((is_local, index))
+        state.upvalues.append((is_local, index))
+        return len(state.upvalues) - 1
+
+    def __named_variable(self, name: Token, assign: bool) -> None:
+        if (slot := self.__resolve_local(self.__state, name.lexeme)) is not None:
+            self.__emit(OpCode.SET_LOCAL if assign else OpCode.GET_LOCAL, slot)
+        elif (index := self.__resolve_upvalue(self.__state, name.lexeme)) is not None:
+            self.__emit(OpCode.SET_UPVALUE if assign else OpCode.GET_UPVALUE, index)
+        else:
+            op = OpCode.SET_GLOBAL if assign else OpCode.GET_GLOBAL
+            self.__emit(op, self.__constant(name), token=name)
+
+    def __function(self, stmt: s.Function, type_: FunctionType) -> None:
+        function = FunctionProto(stmt.name.lexeme, len(stmt.params), type_ == FunctionType.INITIALIZER)
+        state = self.__state = _FunctionState(self.__state, function, type_)
+        state.locals.append(_Local("this" if type_ != FunctionType.FUNCTION else "", 0))
+
+        self.__begin_scope()
+        for param in stmt.params:
+            self.__add_local(param.lexeme)
+        for body_stmt in stmt.body:
+            self.__statement(body_stmt)
+        self.__emit_return()
+
+        function.upvalue_count = len(state.upvalues)
+        self.__state = state.enclosing  # type: ignore[assignment]
+
+        self.__emit(OpCode.CLOSURE, self.__constant(function))
+        for is_local, index in state.upvalues:
+            self.__chunk.write(int(is_local))
+            self.__chunk.write(index)
+
+    def visit_expression(self, stmt: s.Expression) -> None:
+        self.__expression(stmt.expression)
+        self.__emit(OpCode.POP)
+
+    def visit_print(self, stmt: s.Print) -> None:
+        self.__expression(stmt.expression)
+        self.__emit(OpCode.PRINT)
+
+    def visit_var(self, stmt: s.Var) -> None:
+        if stmt.initializer is not None:
+            self.__expression(stmt.initializer)
+        else:
+            self.__emit(OpCode.NIL)
+        self.__define_variable(stmt.name)
+
+    def visit_block(self, stmt: s.Block) -> None:
+        self.__begin_scope()
+        for statement in stmt.statments:
+            self.__statement(statement)
+        self.__end_scope()
+
+    def visit_if(self, stmt: s.If) -> None:
+        self.__expression(stmt.condition)
+        then_jump = self.__emit_jump(OpCode.JUMP_IF_FALSE)
+        self.__emit(OpCode.POP)
+        self.__statement(stmt.then_branch)
+        else_jump = self.__emit_jump(OpCode.JUMP)
+
+        self.__patch_jump(then_jump)
+        self.__emit(OpCode.POP)
+        self.__statement(stmt.else_branch)
+        self.__patch_jump(else_jump)
+
+    def visit_while(self, stmt: s.While) -> None:
+        loop_start = len(self.__chunk.code)
+        self.__expression(stmt.condition)
+        exit_jump = self.__emit_jump(OpCode.JUMP_IF_FALSE)
+        self.__emit(OpCode.POP)
+        self.__statement(stmt.body)
+        self.__emit(OpCode.LOOP, loop_start)
+
+        self.__patch_jump(exit_jump)
+        self.__emit(OpCode.POP)
+
+    def visit_for(self, stmt: s.For) -> None:
+        scoped = isinstance(stmt.initializer, s.Var)
+        if scoped:
+            self.__begin_scope()
+        self.__statement(stmt.initializer)
+
+        loop_start = len(self.__chunk.code)
+        exit_jump = None
+        if stmt.condition is not None:
+            self.__expression(stmt.condition)
+            exit_jump = self.__emit_jump(OpCode.JUMP_IF_FALSE)
+            self.__emit(OpCode.POP)
+        self.__statement(stmt.body)
+        if stmt.increment is not None:
+            self.__expression(stmt.increment)
+            self.__emit(OpCode.POP)
+        self.__emit(OpCode.LOOP, loop_start)
+
+        if exit_jump is not None:
+            self.__patch_jump(exit_jump)
+            self.__emit(OpCode.POP)
+        if scoped:
+            self.__end_scope()
+
+    def visit_function(self, stmt: s.Function) -> None:
+        if self.__state.scope_depth > 0:
+            self.__add_local(stmt.name.lexeme)
+            self.__function(stmt, FunctionType.FUNCTION)
+        else:
+            self.__function(stmt, FunctionType.FUNCTION)
+            self.__emit(OpCode.DEFINE_GLOBAL, self.__constant(stmt.name))
+
+    def visit_return(self, stmt: s.Return) -> None:
+        if stmt.value is None:
+            self.__emit_return()
+        elif isinstance(stmt.value, e.Call) and self.__state.type_ in (FunctionType.FUNCTION, FunctionType.METHOD):
+            # The VM reuses the returning frame for the callee, so tail-recursive code runs in constant stack space.
+            self.__call(stmt.value, OpCode.TAIL_CALL)
+            self.__emit(OpCode.RETURN)
+        else:
+            self.__expression(stmt.value)
+            self.__emit(OpCode.RETURN)
+
+    def visit_class(self, stmt: s.Class) -> None:
+        # Mirrors `Interpreter.visit_class`: the name is bound to nil while the methods close over it.
+        self.__emit(OpCode.NIL)
+        self.__define_variable(stmt.name)
+
+        for method in stmt.methods:
+            self.__function(method, FunctionType.INITIALIZER if method.name.lexeme == "init" else FunctionType.METHOD)
+        self.__emit(OpCode.CLASS, self.__constant(stmt.name.lexeme), len(stmt.methods))
+
+        self.__named_variable(stmt.name, assign=True)
+        self.__emit(OpCode.POP)
+
+    def visit_literal(self, expr: e.Literal) -> None:
+        if expr.value is None:
+            self.__emit(OpCode.NIL)
+        elif expr.value is True:
+            self.__emit(OpCode.TRUE)
+        elif expr.value is False:
+            self.__emit(OpCode.FALSE)
+        else:
+            self.__emit(OpCode.CONSTANT, self.__constant(expr.value))
+
+    def visit_grouping(self, expr: e.Grouping) -> None:
+        self.__expression(expr.expression)
+
+    def visit_unary(self, expr: e.Unary) -> None:
+        self.__expression(expr.right)
+        match expr.operator.type_:
+            case TokenType.BANG:
+                self.__emit(OpCode.NOT)
+            case TokenType.MINUS:
+                self.__emit(OpCode.NEGATE, token=expr.operator)
+
+    def visit_binary(self, expr: e.Binary) -> None:
+        self.__expression(expr.left)
+        self.__expression(expr.right)
+        self.__emit(BINARY_OPS[expr.operator.type_], token=expr.operator)
+
+    def visit_logical(self, expr: e.Logical) -> None:
+        self.__expression(expr.left)
+        if expr.operator.type_ == TokenType.OR:
+            else_jump = self.__emit_jump(OpCode.JUMP_IF_FALSE)
+            end_jump = self.__emit_jump(OpCode.JUMP)
+            self.__patch_jump(else_jump)
+        else:
+            end_jump = self.__emit_jump(OpCode.JUMP_IF_FALSE)
+        self.__emit(OpCode.POP)
+        self.__expression(expr.right)
+        self.__patch_jump(end_jump)
+
+    def visit_variable(self, expr: e.Variable) -> None:
+        self.__named_variable(expr.name, assign=False)
+
+    def visit_assign(self, expr: e.Assign) -> None:
+        self.__expression(expr.value)
+        self.__named_variable(expr.name, assign=True)
+
+    def visit_call(self, expr: e.Call) -> None:
+        self.__call(expr, OpCode.CALL)
+
+    def __call(self, expr: e.Call, op: OpCode) -> None:
+        if isinstance(expr.callee, e.Get):
+            # `obj.m(x)` calls the method with `obj` in its receiver slot, so no bound method is made.
+            self.__expression(expr.callee.obj)
+            self.__emit(OpCode.GET_CALLEE, self.__constant(PropertyCache(expr.callee.name)), token=expr.callee.name)
+            op = OpCode.TAIL_INVOKE if op == OpCode.TAIL_CALL else OpCode.INVOKE
+        else:
+            self.__expression(expr.callee)
+        # The tree-walker rejects a non-callable callee before evaluating the arguments; keep that ordering whenever
+        # an argument could have a visible side effect.
+        if not all(isinstance(argument, e.Literal) for argument in expr.arguments):
+            self.__emit(OpCode.CHECK_CALLABLE, token=expr.paren)
+        for argument in expr.arguments:
+            self.__expression(argument)
+        self.__emit(op, len(expr.arguments), token=expr.paren)
+
+    def visit_get(self, expr: e.Get) -> None:
+        self.__expression(expr.obj)
+        self.__emit(OpCode.GET_PROPERTY, self.__constant(PropertyCache(expr.name)), token=expr.name)
+
+    def visit_set(self, expr: e.Set) -> None:
+        self.__expression(expr.obj)
+        if not isinstance(expr.value, e.Literal):
+            self.__emit(OpCode.CHECK_INSTANCE, token=expr.name)
+        self.__expression(expr.value)
+        self.__emit(OpCode.SET_PROPERTY, self.__constant(PropertyCache(expr.name)), token=expr.name)
+
+    def visit_this(self, expr: e.This) -> None:
+        self.__named_variable(expr.keyword, assign=False)
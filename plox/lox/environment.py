@@ -1,47 +1,107 @@
 from __future__ import annotations
 
-from typing import Any, Self
+from dataclasses import dataclass
+from typing import Any
 
 from lox.errors import LoxRuntimeError
 from lox.tokens import Token
 
+# How a resolved variable is reached from the frame that uses it; `Interpreter.locals` maps each use to (kind, index).
+LOCAL = 0  # `values[index]`
+CELL = 1  # `values[index].value`: a local that some closure captures
+FREE = 2  # `cells[index].value`: a variable of an enclosing function
+GLOBAL = 3  # `GlobalEnvironment.cells[index].value`
+
+# The value of a global that has a slot but has not been defined yet.
+UNDEFINED = object()
+
+
+class Cell:
+    """Holds a global, or a captured local variable shared by the frame that declared it and every closure that refers
+    to it."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any = None) -> None:
+        self.value = value
+
 
 class Environment:
-    def __init__(self, enclosing: Environment | None = None) -> None:
-        self.__values: dict[str, Any] = {}
-        self.enclosing = enclosing
+    """A function's frame, or the frame of a block at the top level.
 
-    def define(self, name: str, value: Any) -> None:
-        self.__values[name] = value
+    Each local lives at the slot the `Resolver` assigned to its declaration; blocks nested in the frame stack their
+    locals above the ones already there. `cells` holds the variables the function captured when it was declared.
+    """
 
-    def get(self, name: Token) -> Any:
-        if name.lexeme in self.__values:
-            return self.__values[name.lexeme]
+    __slots__ = ("values", "cells")
+
+    def __init__(self, values: list[Any] | None = None, cells: tuple[Cell, ...] = ()) -> None:
+        self.values: list[Any] = [] if values is None else values
+        self.cells = cells
+
+    def define(self, value: Any) -> None:
+        self.values.append(value)
+
+
+@dataclass(frozen=True, slots=True)
+class FunctionLayout:
+    """What the `Resolver` worked out about a function's frame.
 
-        if self.enclosing is not None:
-            return self.enclosing.get(name)
+    `free` says where each of the function's captured variables is found in the frame that declares it, as (CELL, slot)
+    or (FREE, index). `cell_slots` lists the parameters, and the receiver in slot 0, that are moved into cells on entry.
+    """
 
-        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+    free: tuple[tuple[int, int], ...] = ()
+    cell_slots: tuple[int, ...] = ()
 
-    def get_at(self, distance: int, name: str) -> Any:
-        return self.ancestor(distance).__values[name]
+    def capture(self, environment: Environment) -> tuple[Cell, ...]:
+        return tuple(
+            environment.values[index] if kind == CELL else environment.cells[index] for kind, index in self.free
+        )
 
-    def assign_at(self, distance: int, name: Token, value: Any) -> None:
-        self.ancestor(distance).__values[name.lexeme] = value
 
-    def ancestor(self, distance: int) -> Self:
-        environment = self
-        for _ in range(distance):
-            environment = environment.enclosing
-        return environment
+class GlobalEnvironment:
+    """The outermost scope, as a table of slots.
+
+    A global gets its slot the first time the `Resolver` meets its name, and keeps it for the interpreter's lifetime.
+    Code resolved before a global is defined, or before a REPL line redefines it, therefore sees its value through the
+    same `Cell`. A cell holds `UNDEFINED` until its global is defined.
+    """
+
+    def __init__(self) -> None:
+        self.__slots: dict[str, int] = {}
+        self.cells: list[Cell] = []
+
+    @property
+    def names(self) -> list[str]:
+        """Every name given a slot so far, in slot order."""
+        return list(self.__slots)
+
+    def slot(self, name: str) -> int:
+        if (index := self.__slots.get(name)) is None:
+            index = self.__slots[name] = len(self.cells)
+            self.cells.append(Cell(UNDEFINED))
+        return index
+
+    def cell(self, name: str) -> Cell:
+        return self.cells[self.slot(name)]
+
+    def define(self, name: str, value: Any) -> None:
+        self.cells[self.slot(name)].value = value
+
+    def get(self, name: Token) -> Any:
+        if (index := self.__slots.get(name.lexeme)) is not None and (value := self.cells[index].value) is not UNDEFINED:
+            return value
+
+        raise undefined(name)
 
     def assign(self, name: Token, value: Any) -> None:
-        if name.lexeme in self.__values:
-            self.__values[name.lexeme] = value
+        if (index := self.__slots.get(name.lexeme)) is not None and (cell := self.cells[index]).value is not UNDEFINED:
+            cell.value = value
             return
 
-        if self.enclosing is not None:
-            self.enclosing.assign(name, value)
-            return
+        raise undefined(name)
+
 
-        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+def undefined(name: Token) -> LoxRuntimeError:
+    return LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
@@ -1,5 +1,4 @@
-from typing import Any
-
+from lox.output import Output
 from lox.token_type import TokenType
 from lox.tokens import Token
 
@@ -11,22 +10,18 @@ class LoxRuntimeError(Exception):
         self.message = message
 
 
-class ReturnError(LoxRuntimeError):
-    def __init__(self, value: Any) -> None:
-        super().__init__(None, "")
-        self.value = value
-
-
 class ErrorHandler:
     def __init__(self) -> None:
         self.had_error = False
         self.had_runtime_error = False
+        self.output = Output()
 
     def error(self, line: int, message: str) -> None:
         self.report(line, "", message)
 
     def report(self, line: int, where: str, message: str) -> None:
-        print(f"[line {line}] Error{where}: {message}")
+        self.output.write_line(f"[line {line}] Error{where}: {message}")
+        self.output.flush()
         self.had_error = True
 
     def error_token(self, token: Token, message: str) -> None:
@@ -36,7 +31,8 @@ class ErrorHandler:
             self.report(token.line, f" at '{token.lexeme}'", message)
 
     def runtime_error(self, error: LoxRuntimeError) -> None:
-        print(f"{error.message}\n[line {error.token.line}]")
+        self.output.write_line(f"{error.message}\n[line {error.token.line}]")
+        self.output.flush()
         self.had_runtime_error = True
 
 
@@ -9,10 +9,15 @@ from lox.tokens import Token
 T = TypeVar("T", covariant=True)
 
 
-@dataclass(frozen=True)
+# Nodes hash by identity: `Interpreter.locals` is keyed by node, and structurally equal nodes are distinct uses.
+@dataclass(frozen=True, eq=False, slots=True)
 class Expr(abc.ABC):
     """Base class"""
 
+    def __reduce__(self) -> tuple[type[Expr], tuple[Any, ...]]:
+        # Pickled nodes are rebuilt through __init__, which is much faster than the slots' generated __setstate__.
+        return type(self), tuple([getattr(self, name) for name in self.__match_args__])
+
     @abc.abstractmethod
     def accept(self, visitor: Visitor[T]) -> T:
         pass
@@ -53,7 +58,7 @@ class Visitor(Protocol[T]):
         pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Binary(Expr):
     left: Expr
     operator: Token
@@ -63,7 +68,7 @@ class Binary(Expr):
         return visitor.visit_binary(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Grouping(Expr):
     expression: Expr
 
@@ -71,7 +76,7 @@ class Grouping(Expr):
         return visitor.visit_grouping(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Literal(Expr):
     value: Any
 
@@ -79,7 +84,7 @@ class Literal(Expr):
         return visitor.visit_literal(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Unary(Expr):
     operator: Token
     right: Expr
@@ -88,7 +93,7 @@ class Unary(Expr):
         return visitor.visit_unary(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Variable(Expr):
     name: Token
 
@@ -96,7 +101,7 @@ class Variable(Expr):
         return visitor.visit_variable(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Assign(Expr):
     name: Token
     value: Expr
@@ -105,7 +110,7 @@ class Assign(Expr):
         return visitor.visit_assign(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Logical(Expr):
     left: Expr
     operator: Token
@@ -115,7 +120,7 @@ class Logical(Expr):
         return visitor.visit_logical(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Call(Expr):
     callee: Expr
     paren: Token
@@ -125,7 +130,7 @@ class Call(Expr):
         return visitor.visit_call(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Get(Expr):
     obj: Expr
     name: Token
@@ -134,7 +139,7 @@ class Get(Expr):
         return visitor.visit_get(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Set(Expr):
     obj: Expr
     name: Token
@@ -144,7 +149,7 @@ class Set(Expr):
         return visitor.visit_set(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class This(Expr):
     keyword: Token
 
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import TYPE_CHECKING, Any
+
+import lox.expr as e
+import lox.stmt as s
+from lox.tokens import Token
+
+if TYPE_CHECKING:
+    from lox.errors import LoxRuntimeError
+    from lox.lox_class import LoxInstance
+    from lox.lox_function import FrameFunction
+
+
+class Hook:
+    """Receives interpreter events once registered with `Interpreter.add_hook`. Override only the events you need."""
+
+    def statement_executed(self, stmt: s.Stmt) -> None:
+        """Called just before `stmt` runs."""
+
+    def function_entered(self, function: FrameFunction, arguments: list[Any]) -> None:
+        """Called with the arguments once they are bound, before the body runs."""
+
+    def function_exited(self, function: FrameFunction, result: Any) -> None:
+        """Called when `function` returns normally; a runtime error unwinds without exiting."""
+
+    def instance_allocated(self, instance: LoxInstance) -> None:
+        """Called before the instance's initializer runs."""
+
+    def runtime_error(self, error: LoxRuntimeError) -> None:
+        """Called when `error` reaches the top level, before it is reported."""
+
+
+class NodeCounter(Hook):
+    """Counts how many times each statement runs, e.g. for coverage."""
+
+    def __init__(self) -> None:
+        self.counts: Counter[s.Stmt] = Counter()
+
+    def statement_executed(self, stmt: s.Stmt) -> None:
+        self.counts[stmt] += 1
+
+    def by_line(self) -> Counter[int]:
+        lines: Counter[int] = Counter()
+        for stmt, count in self.counts.items():
+            if (line := node_line(stmt)) is not None:
+                lines[line] += count
+        return lines
+
+
+def node_line(node: e.Expr | s.Stmt) -> int | None:
+    """The line of the first token in `node`, or None for a node made only of literals."""
+    names: tuple[str, ...] = node.__match_args__
+    for name in names:
+        value = getattr(node, name)
+        for child in value if isinstance(value, list) else [value]:
+            if isinstance(child, Token):
+                return child.line
+            if isinstance(child, (e.Expr, s.Stmt)) and (line := node_line(child)) is not None:
+                return line
+    return None
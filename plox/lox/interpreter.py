@@ -1,37 +1,55 @@
 from __future__ import annotations
 
-import time
-from typing import Any
+from typing import Any, Callable
 
 import lox.expr as e
 import lox.stmt as s
-from lox.environment import Environment
-from lox.errors import LoxRuntimeError, ReturnError, handler
+from lox.environment import (
+    CELL,
+    GLOBAL,
+    LOCAL,
+    UNDEFINED,
+    Cell,
+    Environment,
+    FunctionLayout,
+    GlobalEnvironment,
+    undefined,
+)
+from lox.errors import LoxRuntimeError, handler
+from lox.hooks import Hook
 from lox.lox_callable import LoxCallable
-from lox.lox_class import LoxClass, LoxInstance
+from lox.lox_class import LoxClass, LoxInstance, PropertyCache
 from lox.lox_function import LoxFunction
+from lox.output import Output
+from lox.quickening import MISS, BinarySite, FastPath
+from lox.runtime import STRING_TYPES, ClockCallable, concat, is_equal, is_truthy, stringify
 from lox.token_type import TokenType
 from lox.tokens import Token
 
 
-class _ClockCallable(LoxCallable):
-    def __init__(self) -> None:
-        self.arity = 0
-
-    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
-        return time.time()
-
-    def __str__(self) -> str:
-        return "<native fn>"
-
-
 class Interpreter(e.Visitor[Any], s.Visitor[Any]):
-    def __init__(self) -> None:
-        self.globals = Environment()
-        self.locals: dict[e.Expr, int] = {}
-        self.__environment = self.globals
+    # Whether `add_hook` may be used: only the tree-walker reports its events to hooks.
+    supports_hooks = True
 
-        self.globals.define("clock", _ClockCallable())
+    def __init__(self) -> None:
+        self.globals = GlobalEnvironment()
+        self.locals: dict[e.Expr, tuple[int, int]] = {}
+        # Declarations of locals that some closure captures, which are therefore kept in a `Cell`.
+        self.captured: set[s.Var | s.Function | s.Class] = set()
+        self.layouts: dict[s.Function, FunctionLayout] = {}
+        # Blocks and `for` loops that run in the enclosing environment, mapped to whether they declare locals.
+        self.flat_blocks: dict[s.Block | s.For, bool] = {}
+        self.hooks: tuple[Hook, ...] = ()
+        self.output = Output()
+        self.debug = False
+        self.__quickened: dict[e.Binary, FastPath] = {}
+        self.__binary_sites: dict[e.Binary, BinarySite] = {}
+        self.__property_caches: dict[e.Get | e.Set, PropertyCache] = {}
+        # Code outside any function or block runs in an empty frame of its own; what it declares goes to `globals`.
+        self.__top_level = Environment()
+        self.__environment = self.__top_level
+
+        self.globals.define("clock", ClockCallable())
 
     def visit_literal(self, expr: e.Literal) -> Any:
         return expr.value
@@ -49,7 +67,7 @@ class Interpreter(e.Visitor[Any], s.Visitor[Any]):
 
         match expr.operator.type_:
             case TokenType.BANG:
-                return not self.__is_truthy(right)
+                return not is_truthy(right)
             case TokenType.MINUS:
                 self.__check_number_operand(expr.operator, right)
                 return -float(right)
@@ -62,50 +80,55 @@ class Interpreter(e.Visitor[Any], s.Visitor[Any]):
             return
         raise LoxRuntimeError(operator, "Operand must be a number.")
 
-    def __is_truthy(self, object: Any) -> bool:
-        if object is None:
-            return False
-
-        if isinstance(object, bool):
-            return bool(object)
-
-        return True
-
     def visit_binary(self, expr: e.Binary) -> Any:
         left = self.__evaluate(expr.left)
         right = self.__evaluate(expr.right)
 
+        if (fast := self.__quickened.get(expr)) is not None:
+            if (result := fast(left, right)) is not MISS:
+                return result
+            del self.__quickened[expr]
+            self.__binary_sites[expr].deoptimize()
+        return self.__binary(expr, left, right)
+
+    def __binary(self, expr: e.Binary, left: Any, right: Any) -> Any:
+        # Once a node has seen the same kind of operands a few times, visit_binary switches it to a guarded fast path.
+        if (site := self.__binary_sites.get(expr)) is None:
+            site = self.__binary_sites[expr] = BinarySite(expr)
+        if (fast := site.observe(left, right)) is not None:
+            self.__quickened[expr] = site.counting(fast) if self.debug else fast
+
         match expr.operator.type_:
             case TokenType.GREATER:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) > float(right)
+                return left > right
             case TokenType.GREATER_EQUAL:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) >= float(right)
+                return left >= right
             case TokenType.LESS:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) < float(right)
+                return left < right
             case TokenType.LESS_EQUAL:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) <= float(right)
+                return left <= right
             case TokenType.BANG_EQUAL:
-                return not self.__is_equal(left, right)
+                return not is_equal(left, right)
             case TokenType.EQUAL_EQUAL:
-                return self.__is_equal(left, right)
+                return is_equal(left, right)
             case TokenType.MINUS:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) - float(right)
+                return left - right
             case TokenType.SLASH:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) / float(right)
+                return left / right
             case TokenType.STAR:
                 self.__check_number_operands(expr.operator, left, right)
-                return float(left) * float(right)
+                return left * right
             case TokenType.PLUS:
                 if isinstance(left, float) and isinstance(right, float):
                     return left + right
-                if isinstance(left, str) and isinstance(right, str):
-                    return left + right
+                if isinstance(left, STRING_TYPES) and isinstance(right, STRING_TYPES):
+                    return concat(left, right)
                 raise LoxRuntimeError(expr.operator, "Operands must be two numbers or two strings.")
 
         return None
@@ -116,38 +139,64 @@ class Interpreter(e.Visitor[Any], s.Visitor[Any]):
             return
         raise LoxRuntimeError(operator, "Operands must be numbers.")
 
-    def __is_equal(self, a: Any, b: Any) -> bool:
-        if a is None and b is None:
-            return True
-
-        return bool(a == b)
+    def binary_sites(self) -> list[BinarySite]:
+        return list(self.__binary_sites.values())
 
     def interpret(self, statements: list[s.Stmt | None]) -> None:
         try:
             for stmt in statements:
                 self.__execute(stmt)
         except LoxRuntimeError as e:
+            for hook in self.hooks:
+                hook.runtime_error(e)
+            self.output.flush()
             handler.runtime_error(e)
+        finally:
+            self.output.flush()
 
-    def __execute(self, stmt: s.Stmt | None) -> None:
+    def __execute(self, stmt: s.Stmt | None) -> tuple[Any] | None:
         if stmt is None:
-            return
-        stmt.accept(self)
-
-    def resolve(self, expr: e.Expr, depth: int) -> None:
-        self.locals[expr] = depth
-
-    @staticmethod
-    def __stringify(__o: Any) -> str:
-        if __o is None:
-            return "nil"
-        if isinstance(__o, float):
-            text = str(__o)
-            if text.endswith(".0"):
-                text = text.replace(".0", "")
-            return text
+            return None
+        completion: tuple[Any] | None = stmt.accept(self)
+        return completion
 
-        return str(__o)
+    def __execute_hooked(self, stmt: s.Stmt | None) -> tuple[Any] | None:
+        if stmt is None:
+            return None
+        for hook in self.hooks:
+            hook.statement_executed(stmt)
+        completion: tuple[Any] | None = stmt.accept(self)
+        return completion
+
+    def add_hook(self, hook: Hook) -> None:
+        if not self.supports_hooks:
+            raise TypeError(f"{type(self).__name__} does not support hooks")
+        self.hooks = (*self.hooks, hook)
+        # Shadow the plain dispatch on this instance only, so an interpreter without hooks never checks for them.
+        self.__execute = self.__execute_hooked  # type: ignore[method-assign]
+
+    def remove_hook(self, hook: Hook) -> None:
+        self.hooks = tuple(registered for registered in self.hooks if registered is not hook)
+        if not self.hooks and "_Interpreter__execute" in vars(self):
+            del self.__execute
+
+    def resolve(self, expr: e.Expr, kind: int, index: int) -> None:
+        self.locals[expr] = (kind, index)
+
+    def capture(self, declaration: s.Var | s.Function | s.Class) -> None:
+        self.captured.add(declaration)
+
+    def lay_out(self, function: s.Function, layout: FunctionLayout) -> None:
+        self.layouts[function] = layout
+
+    def flatten(self, block: s.Block | s.For, declares: bool) -> None:
+        self.flat_blocks[block] = declares
+
+    def __define(self, name: Token, value: Any) -> None:
+        if (environment := self.__environment) is self.__top_level:
+            self.globals.define(name.lexeme, value)
+        else:
+            environment.define(value)
 
     def visit_expression(self, stmt: s.Expression) -> Any:
         self.__evaluate(stmt.expression)
@@ -155,111 +204,220 @@ class Interpreter(e.Visitor[Any], s.Visitor[Any]):
 
     def visit_print(self, stmt: s.Print) -> Any:
         value = self.__evaluate(stmt.expression)
-        print(self.__stringify(value))
+        self.output.write_line(stringify(value))
         return None
 
     def visit_var(self, stmt: s.Var) -> None:
         value = None
         if stmt.initializer is not None:
             value = self.__evaluate(stmt.initializer)
-        self.__environment.define(stmt.name.lexeme, value)
+        self.__define(stmt.name, Cell(value) if stmt in self.captured else value)
 
     def visit_variable(self, expr: e.Variable) -> Any:
         return self.__look_up_variable(expr.name, expr)
 
     def __look_up_variable(self, name: Token, expr: e.Expr) -> Any:
-        distance = self.locals.get(expr)
-        if distance is None:
-            return self.globals.get(name)
-        return self.__environment.get_at(distance, name.lexeme)
+        kind, index = self.locals[expr]
+        if kind == LOCAL:
+            return self.__environment.values[index]
+        if kind == GLOBAL:
+            if (value := self.globals.cells[index].value) is UNDEFINED:
+                raise undefined(name)
+            return value
+        if kind == CELL:
+            return self.__environment.values[index].value
+        return self.__environment.cells[index].value
 
     def visit_assign(self, expr: e.Assign) -> Any:
         value = self.__evaluate(expr.value)
 
-        distance = self.locals.get(expr)
-        if distance is None:
-            self.globals.assign(expr.name, value)
+        kind, index = self.locals[expr]
+        if kind == LOCAL:
+            self.__environment.values[index] = value
+        elif kind == GLOBAL:
+            if (cell := self.globals.cells[index]).value is UNDEFINED:
+                raise undefined(expr.name)
+            cell.value = value
+        elif kind == CELL:
+            self.__environment.values[index].value = value
         else:
-            self.__environment.assign_at(distance, expr.name, value)
+            self.__environment.cells[index].value = value
 
         return value
 
-    def visit_block(self, stmt: s.Block) -> Any:
-        self.execute_block(stmt.statments, Environment(self.__environment))
+    def visit_block(self, stmt: s.Block) -> tuple[Any] | None:
+        if (declares := self.flat_blocks.get(stmt)) is None:
+            return self.execute_block(stmt.statments, Environment())
+
+        # A flat block's locals are pushed onto the current environment and dropped when it ends. On `return` the
+        # whole frame is discarded, so they are left in place.
+        values = self.__environment.values
+        mark = len(values)
+        for statement in stmt.statments:
+            if (completion := self.__execute(statement)) is not None:
+                return completion
+        if declares:
+            del values[mark:]
+        return None
 
-    def execute_block(self, statements: list[s.Stmt | None], environment: Environment) -> None:
+    # Statements return None when they complete normally and a 1-tuple holding the value when a `return` ran, which
+    # every enclosing statement passes straight up to the function call.
+    def execute_block(
+        self, statements: list[s.Stmt | None] | list[s.Stmt], environment: Environment
+    ) -> tuple[Any] | None:
         previous = self.__environment
         try:
             self.__environment = environment
             for statement in statements:
-                self.__execute(statement)
+                if (completion := self.__execute(statement)) is not None:
+                    return completion
+            return None
         finally:
             self.__environment = previous
 
-    def visit_if(self, stmt: s.If) -> Any:
-        if self.__is_truthy(self.__evaluate(stmt.condition)):
-            self.__execute(stmt.then_branch)
-        elif stmt.else_branch is not None:
-            self.__execute(stmt.else_branch)
+    def visit_if(self, stmt: s.If) -> tuple[Any] | None:
+        if is_truthy(self.__evaluate(stmt.condition)):
+            return self.__execute(stmt.then_branch)
+        if stmt.else_branch is not None:
+            return self.__execute(stmt.else_branch)
+        return None
 
     def visit_logical(self, expr: e.Logical) -> Any:
         left = self.__evaluate(expr.left)
 
         if expr.operator.type_ == TokenType.OR:
-            if self.__is_truthy(left):
+            if is_truthy(left):
                 return left
-        elif not self.__is_truthy(left):
+        elif not is_truthy(left):
             return left
 
         return self.__evaluate(expr.right)
 
-    def visit_while(self, stmt: s.While) -> Any:
-        while self.__is_truthy(self.__evaluate(stmt.condition)):
-            self.__execute(stmt.body)
+    def visit_while(self, stmt: s.While) -> tuple[Any] | None:
+        while is_truthy(self.__evaluate(stmt.condition)):
+            if (completion := self.__execute(stmt.body)) is not None:
+                return completion
+        return None
+
+    def visit_for(self, stmt: s.For) -> tuple[Any] | None:
+        if not isinstance(stmt.initializer, s.Var):
+            self.__execute(stmt.initializer)
+            return self.__loop(stmt)
+
+        if stmt not in self.flat_blocks:
+            previous = self.__environment
+            try:
+                self.__environment = Environment()
+                self.__execute(stmt.initializer)
+                return self.__loop(stmt)
+            finally:
+                self.__environment = previous
+
+        values = self.__environment.values
+        mark = len(values)
+        self.__execute(stmt.initializer)
+        if (completion := self.__loop(stmt)) is not None:
+            return completion
+        del values[mark:]
+        return None
+
+    def __loop(self, stmt: s.For) -> tuple[Any] | None:
+        condition, increment, body = stmt.condition, stmt.increment, stmt.body
+        while condition is None or is_truthy(self.__evaluate(condition)):
+            if (completion := self.__execute(body)) is not None:
+                return completion
+            if increment is not None:
+                self.__evaluate(increment)
+        return None
 
     def visit_call(self, expr: e.Call) -> Any:
-        callee: LoxCallable = self.__evaluate(expr.callee)
+        if isinstance(expr.callee, e.Get):
+            instance = self.__instance(expr.callee)
+            cache = self.__property_cache(expr.callee)
+            if (method := cache.method_for(instance)) is not None:
+                return self.__call_frame(expr, method, instance)
+            callee = cache.get(instance)
+        else:
+            callee = self.__evaluate(expr.callee)
+        if type(callee) is LoxFunction:  # pylint: disable=unidiomatic-typecheck
+            return self.__call_frame(expr, callee, callee.receiver)
+
         if not isinstance(callee, LoxCallable):
             raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
         arguments = [self.__evaluate(arg) for arg in expr.arguments]
         if len(arguments) != callee.arity:
             raise LoxRuntimeError(expr.paren, f"Expected {callee.arity} arguments but got {len(arguments)}.")
-        return callee(self, arguments)
+        try:
+            return callee(self, arguments)
+        except RecursionError:
+            # Each Lox call costs several Python frames here; `--backend bytecode` keeps its call stack on the heap.
+            raise LoxRuntimeError(expr.paren, "Stack overflow.") from None
+
+    def __call_frame(self, expr: e.Call, function: LoxFunction, receiver: LoxInstance | None) -> Any:
+        # The arguments are evaluated straight into the callee's frame, after the receiver in slot 0. A method call
+        # `obj.m(x)` passes `obj` itself, so no bound method is made.
+        values = [receiver]
+        for argument in expr.arguments:
+            values.append(self.__evaluate(argument))
+        if len(values) - 1 != function.arity:
+            raise LoxRuntimeError(expr.paren, f"Expected {function.arity} arguments but got {len(values) - 1}.")
+        try:
+            return function.call_frame(self, values)
+        except RecursionError:
+            raise LoxRuntimeError(expr.paren, "Stack overflow.") from None
 
     def visit_function(self, stmt: s.Function) -> Any:
-        function = LoxFunction(stmt, self.__environment, False)
-        self.__environment.define(stmt.name.lexeme, function)
+        self.__define_declared(stmt, lambda: self.__function(stmt, False))
 
-    def visit_return(self, stmt: s.Return) -> Any:
-        value: Any = None
-        if stmt.value is not None:
-            value = self.__evaluate(stmt.value)
+    def __function(self, stmt: s.Function, is_initializer: bool) -> LoxFunction:
+        layout = self.layouts[stmt]
+        return LoxFunction(stmt, layout, layout.capture(self.__environment), is_initializer)
 
-        raise ReturnError(value)
+    def __define_declared(self, stmt: s.Function | s.Class, make: Callable[[], Any]) -> None:
+        if stmt not in self.captured:
+            self.__define(stmt.name, make())
+            return
+        # The cell is defined first, so that the function or the methods can capture the variable holding themselves.
+        cell = Cell()
+        self.__define(stmt.name, cell)
+        cell.value = make()
+
+    def visit_return(self, stmt: s.Return) -> tuple[Any] | None:
+        if stmt.value is None:
+            return (None,)
+        return (self.__evaluate(stmt.value),)
 
     def visit_class(self, stmt: s.Class) -> Any:
-        self.__environment.define(stmt.name.lexeme, None)
-        methods = {
-            method.name.lexeme: LoxFunction(method, self.__environment, method.name.lexeme == "init")
-            for method in stmt.methods
-        }
-        klass = LoxClass(stmt.name.lexeme, methods)
-        self.__environment.assign(stmt.name, klass)
+        self.__define_declared(
+            stmt,
+            lambda: LoxClass(
+                stmt.name.lexeme,
+                {method.name.lexeme: self.__function(method, method.name.lexeme == "init") for method in stmt.methods},
+            ),
+        )
 
     def visit_get(self, expr: e.Get) -> Any:
+        return self.__property_cache(expr).get(self.__instance(expr))
+
+    def __instance(self, expr: e.Get) -> LoxInstance:
         obj = self.__evaluate(expr.obj)
         if isinstance(obj, LoxInstance):
-            return obj.get(expr.name)
+            return obj
 
         raise LoxRuntimeError(expr.name, "Only instances have properties.")
 
+    def __property_cache(self, expr: e.Get | e.Set) -> PropertyCache:
+        if (cache := self.__property_caches.get(expr)) is None:
+            cache = self.__property_caches[expr] = PropertyCache(expr.name)
+        return cache
+
     def visit_set(self, expr: e.Set) -> Any:
         obj = self.__evaluate(expr.obj)
         if not isinstance(obj, LoxInstance):
             raise LoxRuntimeError(expr.name, "Only instances have fields.")
 
         value = self.__evaluate(expr.value)
-        obj.set(expr.name, value)
+        self.__property_cache(expr).set(obj, value)
         return value
 
     def visit_this(self, expr: e.This) -> Any:
@@ -1,14 +1,22 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Protocol, runtime_checkable
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any
 
 if TYPE_CHECKING:
     from lox.interpreter import Interpreter
 
 
-@runtime_checkable
-class LoxCallable(Protocol):
+class LoxCallable(ABC):
+    """Base class of every value Lox code can call.
+
+    A nominal base rather than a runtime-checkable protocol: every call checks its callee with `isinstance`, and
+    against a protocol that check inspects the object's attributes each time. `ABCMeta` caches the answer per type.
+    """
+
+    __slots__ = ()
+
     arity: int
 
-    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
-        pass
+    @abstractmethod
+    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any: ...
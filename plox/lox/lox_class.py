@@ -11,46 +11,133 @@ if TYPE_CHECKING:
     from lox.tokens import Token
 
 
+class Shape:
+    """The field layout shared by instances that were given the same fields in the same order.
+
+    `indexes` maps each field name to its position in `LoxInstance.values`. Adding a field moves an instance to the
+    child shape for that name, which is created once and then shared through `transitions`.
+    """
+
+    __slots__ = ("indexes", "transitions")
+
+    def __init__(self, indexes: dict[str, int] | None = None) -> None:
+        self.indexes: dict[str, int] = {} if indexes is None else indexes
+        self.transitions: dict[str, Shape] = {}
+
+    def with_field(self, name: str) -> Shape:
+        if (shape := self.transitions.get(name)) is None:
+            shape = self.transitions[name] = Shape({**self.indexes, name: len(self.indexes)})
+        return shape
+
+
 class LoxClass(LoxCallable):
     def __init__(self, name: str, methods: dict[str, LoxFunction]) -> None:
         self.name = name
         self.__methods = methods
+        self.initializer = methods.get("init")
+        self.arity = 0 if self.initializer is None else self.initializer.arity
+        # Each class roots its own shape tree, so a shape also identifies the class of its instances.
+        self.shape = Shape()
 
     def __str__(self) -> str:
         return self.name
 
     def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
         instance = LoxInstance(self)
-        if initializer := self.find_method("init"):
-            initializer.bind(instance)(interpreter, arguments)
+        if interpreter.hooks:
+            for hook in interpreter.hooks:
+                hook.instance_allocated(instance)
+        if self.initializer is not None:
+            self.initializer.call_method(interpreter, instance, arguments)
         return instance
 
-    @property
-    def arity(self) -> int:
-        if initializer := self.find_method("init"):
-            return initializer.arity
-        return 0
-
     def find_method(self, name: str) -> LoxFunction:
         return self.__methods.get(name)
 
 
 class LoxInstance:
+    __slots__ = ("klass", "shape", "values")
+
     def __init__(self, klass: LoxClass) -> None:
-        self.__klass = klass
-        self.__fields: dict[str, Any] = {}
+        self.klass = klass
+        self.shape = klass.shape
+        self.values: list[Any] = []
 
     def get(self, name: Token) -> Any:
-        if name.lexeme in self.__fields:
-            return self.__fields[name.lexeme]
+        if (index := self.shape.indexes.get(name.lexeme)) is not None:
+            return self.values[index]
 
-        if method := self.__klass.find_method(name.lexeme):
+        if method := self.klass.find_method(name.lexeme):
             return method.bind(self)
 
         raise LoxRuntimeError(name, f"Undefined property '{name.lexeme}'.")
 
     def set(self, name: Token, value: Any) -> None:
-        self.__fields[name.lexeme] = value
+        if (index := self.shape.indexes.get(name.lexeme)) is not None:
+            self.values[index] = value
+        else:
+            self.shape = self.shape.with_field(name.lexeme)
+            self.values.append(value)
+
+    def __str__(self) -> str:
+        return f"{self.klass.name} instance"
+
+
+class PropertyCache:
+    """Inline cache for one `obj.name` site, keyed by the receiver's shape.
+
+    A shape fixes both the class and the field layout, so while the site keeps seeing one shape it knows without any
+    lookup whether `name` is a field and at which index, or else which method it names. Giving an instance a field
+    that shadows a method moves it to a new shape, which invalidates the entry.
+    """
+
+    __slots__ = ("name", "lexeme", "shape", "index", "transition", "method")
+
+    def __init__(self, name: Token) -> None:
+        self.name = name
+        self.lexeme = name.lexeme
+        self.shape: Shape | None = None
+        self.index: int | None = None
+        self.transition: Shape | None = None
+        self.method: LoxFunction | None = None
+
+    def get(self, instance: LoxInstance) -> Any:
+        if instance.shape is not self.shape:
+            self.__lookup(instance)
+        if self.index is not None:
+            return instance.values[self.index]
+
+        return self.__method().bind(instance)
+
+    def method_for(self, instance: LoxInstance) -> LoxFunction | None:
+        """The method `name` names on `instance`, unbound, or None when it names a field. For a site that calls the
+        method right away, which can then pass the receiver itself."""
+        if instance.shape is not self.shape:
+            self.__lookup(instance)
+        if self.index is not None:
+            return None
+        return self.__method()
+
+    def set(self, instance: LoxInstance, value: Any) -> None:
+        if instance.shape is not self.shape:
+            self.__lookup(instance)
+            self.transition = None if self.index is not None else instance.shape.with_field(self.lexeme)
+
+        if self.transition is None:
+            instance.values[self.index] = value  # type: ignore[index]
+        else:
+            instance.shape = self.transition
+            instance.values.append(value)
+
+    def __lookup(self, instance: LoxInstance) -> None:
+        self.shape = instance.shape
+        self.index = instance.shape.indexes.get(self.lexeme)
+        self.method = None if self.index is not None else instance.klass.find_method(self.lexeme)
+
+    def __method(self) -> LoxFunction:
+        if self.method is None:
+            raise LoxRuntimeError(self.name, f"Undefined property '{self.lexeme}'.")
+        return self.method
 
     def __str__(self) -> str:
-        return f"{self.__klass.name} instance"
+        return self.lexeme
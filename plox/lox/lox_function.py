@@ -1,44 +1,98 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Self
+from abc import abstractmethod
+from typing import TYPE_CHECKING, Any
 
-from lox.environment import Environment
-from lox.errors import ReturnError
+from lox.environment import Cell, Environment, FunctionLayout
 from lox.lox_callable import LoxCallable
 
 if TYPE_CHECKING:
     from lox.interpreter import Interpreter
     from lox.lox_class import LoxInstance
     from lox.stmt import Function
+    from lox.tokens import Token
 
 
-class LoxFunction(LoxCallable):
-    def __init__(self, declaration: Function, closure: Environment, is_initializer: bool) -> None:
-        self.__declaration = declaration
-        self.arity = len(self.__declaration.params)
-        self.__closure = closure
-        self.__is_initializer = is_initializer
+class FrameFunction(LoxCallable):
+    """A Lox function that runs on a frame laid out by the `Resolver`.
+
+    Subclasses only say how to run the body; setting up the frame, hooks and what a call returns are shared, so the
+    backends built on this class cannot drift apart.
+    """
+
+    def __init__(
+        self,
+        arity: int,
+        layout: FunctionLayout,
+        cells: tuple[Cell, ...],
+        is_initializer: bool,
+        receiver: LoxInstance | None,
+    ) -> None:
+        self.arity = arity
+        self.layout = layout
+        self.cells = cells
+        self.is_initializer = is_initializer
+        self.receiver = receiver
 
     def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
-        environment = Environment(self.__closure)
+        return self.call_frame(interpreter, [self.receiver, *arguments])
+
+    def call_method(self, interpreter: Interpreter, receiver: LoxInstance, arguments: list[Any]) -> Any:
+        return self.call_frame(interpreter, [receiver, *arguments])
+
+    @abstractmethod
+    def call_frame(self, interpreter: Interpreter, values: list[Any]) -> Any:
+        """Runs the function on a new frame holding the receiver, or None for a plain function, followed by the
+        arguments. The caller has checked the arity.
 
-        for param, argument in zip(self.__declaration.params, arguments):
-            environment.define(param.lexeme, argument)
+        Implementations run the body between `_enter` and `_leave`. The body runs in `call_frame` itself, rather than in
+        a method it calls, so that each Lox call costs as few Python frames as possible.
+        """
+
+    def _enter(self, interpreter: Interpreter, values: list[Any]) -> Environment:
+        if interpreter.hooks:
+            for hook in interpreter.hooks:
+                hook.function_entered(self, values[1:])
+        for slot in self.layout.cell_slots:
+            values[slot] = Cell(values[slot])
+        return Environment(values, self.cells)
+
+    def _leave(self, interpreter: Interpreter, receiver: LoxInstance | None, completion: tuple[Any] | None) -> Any:
+        if self.is_initializer:
+            result = receiver
+        elif completion is not None:
+            result = completion[0]
+        else:
+            result = None
+        if interpreter.hooks:
+            for hook in interpreter.hooks:
+                hook.function_exited(self, result)
+        return result
+
+
+class LoxFunction(FrameFunction):
+    def __init__(
+        self,
+        declaration: Function,
+        layout: FunctionLayout,
+        cells: tuple[Cell, ...],
+        is_initializer: bool,
+        receiver: LoxInstance | None = None,
+    ) -> None:
+        super().__init__(len(declaration.params), layout, cells, is_initializer, receiver)
+        self.__declaration = declaration
 
-        try:
-            interpreter.execute_block(self.__declaration.body, environment)
-        except ReturnError as return_value:
-            if self.__is_initializer:
-                return self.__closure.get_at(0, "this")
-            return return_value.value
+    def call_frame(self, interpreter: Interpreter, values: list[Any]) -> Any:
+        receiver = values[0]
+        completion = interpreter.execute_block(self.__declaration.body, self._enter(interpreter, values))
+        return self._leave(interpreter, receiver, completion)
 
-        if self.__is_initializer:
-            return self.__closure.get_at(0, "this")
+    @property
+    def name(self) -> Token:
+        return self.__declaration.name
 
     def __str__(self) -> str:
         return f"<fn {self.__declaration.name.lexeme}>"
 
-    def bind(self, instance: LoxInstance) -> Self:
-        environment = Environment(self.__closure)
-        environment.define("this", instance)
-        return LoxFunction(self.__declaration, environment, self.__is_initializer)
+    def bind(self, instance: LoxInstance) -> LoxFunction:
+        return LoxFunction(self.__declaration, self.layout, self.cells, self.is_initializer, instance)
@@ -1,59 +1,240 @@
+import argparse
 import sys
 from pathlib import Path
+from typing import Iterable, NoReturn
 
+import lox.stmt as s
 from lox.ast_printer import AstPrinter
+from lox.cache import DEFAULT_MAX_BYTES, ProgramCache
+from lox.closure_compiler import ClosureInterpreter
 from lox.errors import handler
 from lox.interpreter import Interpreter
+from lox.optimizer import DEFAULT_LEVEL, Optimizer
 from lox.parser import Parser
+from lox.profiler import Profiler
+from lox.quickening import report
 from lox.resolver import Resolver
-from lox.scanner import Scanner
+from lox.scanner import FastScanner, Scanner
+from lox.tokens import Token
+from lox.transpiler import PythonInterpreter
+from lox.vm import FRAMES_MAX, VM
 
+BACKENDS: dict[str, type[Interpreter]] = {
+    "tree": Interpreter,
+    "closure": ClosureInterpreter,
+    "bytecode": VM,
+    "python": PythonInterpreter,
+}
 
-def run(source: str, interpreter: Interpreter) -> None:
-    tokens = list(Scanner(source))
+SCANNERS: dict[str, type[Scanner]] = {
+    "regex": FastScanner,
+    "simple": Scanner,
+}
+
+
+def run(
+    source: str, interpreter: Interpreter, scanner: type[Scanner] = FastScanner, opt_level: int = DEFAULT_LEVEL
+) -> None:
+    run_tokens(scanner(source), interpreter, opt_level)
+
+
+def run_tokens(tokens: Iterable[Token], interpreter: Interpreter, opt_level: int = DEFAULT_LEVEL) -> None:
+    if (statements := compile_program(tokens, interpreter, opt_level)) is not None:
+        interpreter.interpret(statements)
+
+
+def compile_program(
+    tokens: Iterable[Token], interpreter: Interpreter, opt_level: int = DEFAULT_LEVEL
+) -> list[s.Stmt | None] | None:
     parser = Parser(tokens)
     statements = parser.parse()
 
     if handler.had_error or statements is None:
-        return
+        return None
 
     resolver = Resolver(interpreter)
     resolver.resolve(statements)
 
     if handler.had_error:
-        return
-
-    interpreter.interpret(statements)
-
+        return None
+
+    return Optimizer(interpreter, opt_level).optimize(statements)
+
+
+def run_file(
+    path: str,
+    interpreter: Interpreter,
+    scanner: type[Scanner] = FastScanner,
+    cache: ProgramCache | None = None,
+    opt_level: int = DEFAULT_LEVEL,
+) -> None:
+    key = program = None
+    if cache is not None:
+        key = cache.key(path, f"O{opt_level}")
+        program = cache.load(key)
+
+    if program is not None:
+        statements, locals_, flat_blocks, captured, layouts, global_names = program
+        # Global uses were resolved to slots in the order the names were met. A fresh interpreter has only given slots
+        # to the built-ins, which come first in that order too, so giving the rest slots in turn reproduces the table.
+        for name in global_names:
+            interpreter.globals.slot(name)
+        interpreter.locals.update(locals_)
+        interpreter.flat_blocks.update(flat_blocks)
+        interpreter.captured.update(captured)
+        interpreter.layouts.update(layouts)
+        interpreter.interpret(statements)
+    else:
+        with open(path, encoding="utf-8") as file:
+            compiled = compile_program(scanner.from_stream(file), interpreter, opt_level)
+        if compiled is not None:
+            if cache is not None and key is not None:
+                cache.store(
+                    key,
+                    compiled,
+                    interpreter.locals,
+                    interpreter.flat_blocks,
+                    interpreter.captured,
+                    interpreter.layouts,
+                    interpreter.globals.names,
+                )
+            interpreter.interpret(compiled)
 
-def run_file(path: str) -> None:
-    file = Path(path).read_text(encoding="utf-8")
-    run(file, Interpreter())
     if handler.had_error:
         sys.exit(65)
     if handler.had_runtime_error:
         sys.exit(70)
 
 
-def run_prompt() -> None:
-    i = Interpreter()
+def run_prompt(interpreter: Interpreter, scanner: type[Scanner] = FastScanner, opt_level: int = DEFAULT_LEVEL) -> None:
     try:
         while True:
-            run(input("> "), i)
+            run(input("> "), interpreter, scanner, opt_level)
             handler.had_error = False
     except KeyboardInterrupt:
         return
 
 
-def main() -> None:
-    if len(sys.argv) == 1:
-        return run_prompt()
+class _ArgumentParser(argparse.ArgumentParser):
+    def error(self, message: str) -> NoReturn:
+        # A bad command line exits with sysexits' EX_USAGE, as it always has, rather than argparse's 2.
+        self.print_usage(sys.stderr)
+        self.exit(64, f"{self.prog}: error: {message}\n")
 
-    if len(sys.argv) == 2:
-        return run_file(sys.argv[1])
 
-    print("Usage: plox [script]")
-    sys.exit(64)
+def main() -> None:
+    parser = _ArgumentParser(prog="plox")
+    parser.add_argument("script", nargs="?")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="tree",
+        help="execution backend: the tree-walking interpreter, compiled closures, the bytecode VM or Python bytecode",
+    )
+    parser.add_argument(
+        "--dump-python",
+        metavar="FILE",
+        type=Path,
+        help="with --backend python, write the generated Python module to FILE",
+    )
+    parser.add_argument(
+        "--max-depth",
+        metavar="N",
+        type=int,
+        help=f"with --backend bytecode, the deepest Lox call stack before 'Stack overflow.' (default {FRAMES_MAX})",
+    )
+    parser.add_argument(
+        "--scanner",
+        choices=SCANNERS,
+        default="regex",
+        help="tokenizer: one regex match per token, or the character-at-a-time reference scanner",
+    )
+    parser.add_argument(
+        "-O",
+        "--opt-level",
+        type=int,
+        choices=range(3),
+        default=DEFAULT_LEVEL,
+        help="0: none, 1: fold constant expressions, 2: also drop branches and loops with constant conditions",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="sample the running script and report time per Lox function and line on stderr (tree backend only)",
+    )
+    parser.add_argument(
+        "--profile-collapsed",
+        metavar="FILE",
+        type=Path,
+        help="with --profile, also write the sampled stacks in the collapsed format read by flamegraph tools",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="after the script, report how each binary operator was specialized on stderr (tree backend only)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always scan, parse and resolve the script instead of using the on-disk program cache",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        type=Path,
+        help="program cache directory (default: $PLOX_CACHE_DIR, else $XDG_CACHE_HOME/plox or ~/.cache/plox)",
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        metavar="N",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="evict the least recently used cached programs once the cache grows past N bytes",
+    )
+    args = parser.parse_args()
+
+    interpreter = BACKENDS[args.backend]()
+    if args.dump_python is not None:
+        if not isinstance(interpreter, PythonInterpreter):
+            parser.error("--dump-python requires --backend python")
+        interpreter.dump_path = args.dump_python
+    if args.max_depth is not None:
+        if not isinstance(interpreter, VM):
+            parser.error("--max-depth requires --backend bytecode")
+        if args.max_depth < 1:
+            parser.error("--max-depth must be at least 1")
+        interpreter.frames_max = args.max_depth
+    if args.profile_collapsed is not None and not args.profile:
+        parser.error("--profile-collapsed requires --profile")
+    if args.profile and (args.script is None or type(interpreter) is not Interpreter):
+        parser.error("--profile requires a script and --backend tree")
+    if args.debug:
+        if args.script is None or type(interpreter) is not Interpreter:
+            parser.error("--debug requires a script and --backend tree")
+        interpreter.debug = True
+    if args.script is None:
+        return run_prompt(interpreter, SCANNERS[args.scanner], args.opt_level)
+
+    cache = None if args.no_cache else ProgramCache(args.cache_dir, args.cache_max_bytes)
+    if args.debug:
+        try:
+            run_file(args.script, interpreter, SCANNERS[args.scanner], cache, args.opt_level)
+        finally:
+            report(interpreter.binary_sites(), sys.stderr)
+        return None
+    if not args.profile:
+        return run_file(args.script, interpreter, SCANNERS[args.scanner], cache, args.opt_level)
+
+    profiler = Profiler()
+    try:
+        with profiler:
+            run_file(args.script, interpreter, SCANNERS[args.scanner], cache, args.opt_level)
+    finally:
+        profiler.report()
+        if args.profile_collapsed is not None:
+            with args.profile_collapsed.open("w", encoding="utf-8") as file:
+                profiler.write_collapsed(file)
+    return None
 
 
 if __name__ == "__main__":
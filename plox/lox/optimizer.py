@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import dataclasses
+import operator
+from typing import Any, Callable, TypeVar
+
+import lox.expr as e
+import lox.stmt as s
+from lox.interpreter import Interpreter
+from lox.runtime import is_equal, is_truthy
+from lox.token_type import TokenType
+
+DEFAULT_LEVEL = 2
+
+Node = TypeVar("Node", e.Expr, s.Stmt)
+
+_NUMBER_OPERATORS: dict[TokenType, Callable[[float, float], Any]] = {
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.MINUS: operator.sub,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+}
+
+_UNFOLDABLE = object()
+
+
+def _fold_binary(type_: TokenType, left: Any, right: Any) -> Any:
+    match type_:
+        case TokenType.EQUAL_EQUAL:
+            return is_equal(left, right)
+        case TokenType.BANG_EQUAL:
+            return not is_equal(left, right)
+        case TokenType.PLUS:
+            if isinstance(left, float) and isinstance(right, float):
+                return left + right
+            if isinstance(left, str) and isinstance(right, str):
+                return left + right
+        case TokenType.SLASH if right == 0:
+            # Left in place so the division fails at run time, exactly as it would unoptimized.
+            return _UNFOLDABLE
+        case _ if type_ in _NUMBER_OPERATORS and isinstance(left, float) and isinstance(right, float):
+            return _NUMBER_OPERATORS[type_](left, right)
+
+    return _UNFOLDABLE
+
+
+class Optimizer(e.Visitor[e.Expr], s.Visitor[s.Stmt | None]):
+    """Rewrites a resolved program. Level 1 folds constant expressions; level 2 also drops branches and loops whose
+    condition is constant, and expression statements that are just a constant.
+
+    An operation that would fail at run time, such as `"a" - 1`, is never folded, so the error is still raised with
+    the same message and line. A rebuilt node takes over the resolved location of the node it replaces.
+    """
+
+    def __init__(self, interpreter: Interpreter, level: int = DEFAULT_LEVEL) -> None:
+        self.__interpreter = interpreter
+        self.__level = level
+
+    def optimize(self, statements: list[s.Stmt | None]) -> list[s.Stmt | None]:
+        if self.__level <= 0:
+            return statements
+        return self.__statements(statements)
+
+    def __statements(self, statements: list[Any]) -> list[Any]:
+        return [optimized for stmt in statements if stmt is not None and (optimized := stmt.accept(self)) is not None]
+
+    def __branch(self, stmt: s.Stmt) -> s.Stmt:
+        optimized = stmt.accept(self)
+        return s.Block([]) if optimized is None else optimized
+
+    def __expr(self, expr: e.Expr) -> e.Expr:
+        return expr.accept(self)
+
+    def __rebuild(self, node: Node, **fields: Any) -> Node:
+        if all(_same(getattr(node, name), value) for name, value in fields.items()):
+            return node
+
+        rebuilt = dataclasses.replace(node, **fields)
+        interpreter = self.__interpreter
+        if isinstance(node, e.Expr) and (location := interpreter.locals.pop(node, None)) is not None:
+            interpreter.locals[rebuilt] = location
+        elif isinstance(node, (s.Block, s.For)) and (declares := interpreter.flat_blocks.pop(node, None)) is not None:
+            interpreter.flat_blocks[rebuilt] = declares  # type: ignore[index]
+        if isinstance(node, s.Function) and (layout := interpreter.layouts.pop(node, None)) is not None:
+            interpreter.layouts[rebuilt] = layout  # type: ignore[index]
+        if node in interpreter.captured:
+            interpreter.captured.discard(node)
+            interpreter.captured.add(rebuilt)  # type: ignore[arg-type]
+        return rebuilt
+
+    def __constant(self, expr: e.Expr) -> bool:
+        return self.__level >= 2 and isinstance(expr, e.Literal)
+
+    def visit_binary(self, expr: e.Binary) -> e.Expr:
+        left = self.__expr(expr.left)
+        right = self.__expr(expr.right)
+        if isinstance(left, e.Literal) and isinstance(right, e.Literal):
+            if (value := _fold_binary(expr.operator.type_, left.value, right.value)) is not _UNFOLDABLE:
+                return e.Literal(value)
+        return self.__rebuild(expr, left=left, right=right)
+
+    def visit_grouping(self, expr: e.Grouping) -> e.Expr:
+        return self.__expr(expr.expression)
+
+    def visit_literal(self, expr: e.Literal) -> e.Expr:
+        return expr
+
+    def visit_unary(self, expr: e.Unary) -> e.Expr:
+        right = self.__expr(expr.right)
+        if isinstance(right, e.Literal):
+            if expr.operator.type_ == TokenType.BANG:
+                return e.Literal(not is_truthy(right.value))
+            if expr.operator.type_ == TokenType.MINUS and isinstance(right.value, float):
+                return e.Literal(-right.value)
+        return self.__rebuild(expr, right=right)
+
+    def visit_variable(self, expr: e.Variable) -> e.Expr:
+        return expr
+
+    def visit_assign(self, expr: e.Assign) -> e.Expr:
+        return self.__rebuild(expr, value=self.__expr(expr.value))
+
+    def visit_logical(self, expr: e.Logical) -> e.Expr:
+        left = self.__expr(expr.left)
+        right = self.__expr(expr.right)
+        if isinstance(left, e.Literal):
+            short_circuits = is_truthy(left.value) == (expr.operator.type_ == TokenType.OR)
+            return left if short_circuits else right
+        return self.__rebuild(expr, left=left, right=right)
+
+    def visit_call(self, expr: e.Call) -> e.Expr:
+        return self.__rebuild(
+            expr, callee=self.__expr(expr.callee), arguments=[self.__expr(argument) for argument in expr.arguments]
+        )
+
+    def visit_get(self, expr: e.Get) -> e.Expr:
+        return self.__rebuild(expr, obj=self.__expr(expr.obj))
+
+    def visit_set(self, expr: e.Set) -> e.Expr:
+        return self.__rebuild(expr, obj=self.__expr(expr.obj), value=self.__expr(expr.value))
+
+    def visit_this(self, expr: e.This) -> e.Expr:
+        return expr
+
+    def visit_expression(self, stmt: s.Expression) -> s.Stmt | None:
+        expression = self.__expr(stmt.expression)
+        if self.__constant(expression):
+            return None
+        return self.__rebuild(stmt, expression=expression)
+
+    def visit_print(self, stmt: s.Print) -> s.Stmt | None:
+        return self.__rebuild(stmt, expression=self.__expr(stmt.expression))
+
+    def visit_var(self, stmt: s.Var) -> s.Stmt | None:
+        if stmt.initializer is None:
+            return stmt
+        return self.__rebuild(stmt, initializer=self.__expr(stmt.initializer))
+
+    def visit_block(self, stmt: s.Block) -> s.Stmt | None:
+        return self.__rebuild(stmt, statments=self.__statements(stmt.statments))
+
+    def visit_if(self, stmt: s.If) -> s.Stmt | None:
+        condition = self.__expr(stmt.condition)
+        if self.__constant(condition):
+            branch = stmt.then_branch if is_truthy(condition.value) else stmt.else_branch  # type: ignore[attr-defined]
+            return None if branch is None else branch.accept(self)
+
+        else_branch = None if stmt.else_branch is None else self.__branch(stmt.else_branch)
+        return self.__rebuild(
+            stmt, condition=condition, then_branch=self.__branch(stmt.then_branch), else_branch=else_branch
+        )
+
+    def visit_while(self, stmt: s.While) -> s.Stmt | None:
+        condition = self.__expr(stmt.condition)
+        if self.__constant(condition) and not is_truthy(condition.value):  # type: ignore[attr-defined]
+            return None
+        return self.__rebuild(stmt, condition=condition, body=self.__branch(stmt.body))
+
+    def visit_for(self, stmt: s.For) -> s.Stmt | None:
+        initializer = None if stmt.initializer is None else stmt.initializer.accept(self)
+        condition = None if stmt.condition is None else self.__expr(stmt.condition)
+        if stmt.initializer is None and condition is not None and self.__constant(condition):
+            if not is_truthy(condition.value):  # type: ignore[attr-defined]
+                return None
+        return self.__rebuild(
+            stmt,
+            initializer=initializer,
+            condition=condition,
+            increment=None if stmt.increment is None else self.__expr(stmt.increment),
+            body=self.__branch(stmt.body),
+        )
+
+    def visit_function(self, stmt: s.Function) -> s.Stmt | None:
+        return self.__rebuild(stmt, body=self.__statements(stmt.body))
+
+    def visit_return(self, stmt: s.Return) -> s.Stmt | None:
+        if stmt.value is None:
+            return stmt
+        return self.__rebuild(stmt, value=self.__expr(stmt.value))
+
+    def visit_class(self, stmt: s.Class) -> s.Stmt | None:
+        return self.__rebuild(stmt, methods=self.__statements(stmt.methods))
+
+
+def _same(old: Any, new: Any) -> bool:
+    if isinstance(old, list):
+        return len(old) == len(new) and all(a is b for a, b in zip(old, new))
+    return old is new
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import sys
+from typing import TextIO
+
+BUFFER_SIZE = 1 << 16
+
+
+class Output:
+    """Where a Lox program's output goes. Lines are collected and written to `stream` in batches of about
+    `buffer_size` characters, or one at a time when the stream is a terminal.
+
+    `stream` defaults to whatever `sys.stdout` is when the buffer is flushed, so `contextlib.redirect_stdout` keeps
+    working. Callers flush before anything else is written to the same stream, and whenever a run ends.
+    """
+
+    def __init__(self, stream: TextIO | None = None, buffer_size: int = BUFFER_SIZE) -> None:
+        self.stream = stream
+        self.buffer_size = 0 if _isatty(sys.stdout if stream is None else stream) else buffer_size
+        self.__lines: list[str] = []
+        self.__size = 0
+
+    def write_line(self, text: str) -> None:
+        self.__lines.append(text)
+        self.__size += len(text)
+        if self.__size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        stream = sys.stdout if self.stream is None else self.stream
+        if lines := self.__lines:
+            lines.append("")
+            self.__lines = []
+            self.__size = 0
+            stream.write("\n".join(lines))
+        stream.flush()
+
+
+def _isatty(stream: TextIO) -> bool:
+    try:
+        return stream.isatty()
+    except (AttributeError, ValueError):
+        return False
@@ -1,3 +1,5 @@
+from typing import Iterable
+
 import lox.expr as e
 import lox.stmt as s
 from lox.errors import handler
@@ -10,9 +12,12 @@ class ParseError(Exception):
 
 
 class Parser:
-    def __init__(self, tokens: list[Token]) -> None:
-        self._tokens = tokens
-        self._current = 0
+    """Pulls tokens from `tokens` on demand; only the current and the previous token are held."""
+
+    def __init__(self, tokens: Iterable[Token]) -> None:
+        self._tokens = iter(tokens)
+        self._next = next(self._tokens)
+        self._previous = self._next
 
     def parse(self) -> list[s.Stmt | None]:
         statements: list[s.Stmt | None] = []
@@ -114,19 +119,7 @@ class Parser:
             increment = self.__expression()
         self.__consume(TokenType.RIGHT_PAREN, "Expect ')' after for clauses.")
 
-        body = self.__statement()
-
-        if increment is not None:
-            body = s.Block([body, s.Expression(increment)])
-
-        if condition is None:
-            condition = e.Literal(True)
-
-        body = s.While(condition, body)
-        if initializer is not None:
-            body = s.Block([initializer, body])
-
-        return body
+        return s.For(initializer, condition, increment, self.__statement())
 
     def __while_statement(self) -> s.Stmt:
         self.__consume(TokenType.LEFT_PAREN, "Expect '(' after 'while'.")
@@ -205,7 +198,7 @@ class Parser:
     def __equality(self) -> e.Expr:
         expr = self.__comparison()
 
-        while self.__match(TokenType.BANG, TokenType.BANG_EQUAL):
+        while self.__match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
             operator = self.__previous
             right = self.__comparison()
             expr = e.Binary(expr, operator, right)
@@ -228,7 +221,8 @@ class Parser:
 
     def __advance(self) -> Token:
         if not self.__is_at_end:
-            self._current += 1
+            self._previous = self._next
+            self._next = next(self._tokens)
 
         return self.__previous
 
@@ -237,11 +231,11 @@ class Parser:
         return self.__peek().type_ == TokenType.EOF
 
     def __peek(self) -> Token:
-        return self._tokens[self._current]
+        return self._next
 
     @property
     def __previous(self) -> Token:
-        return self._tokens[self._current - 1]
+        return self._previous
 
     def __comparison(self) -> e.Expr:
         expr = self.__term()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import defaultdict
+from types import CodeType, FrameType
+from typing import Any, TextIO
+
+import lox.expr as e
+import lox.stmt as s
+from lox.hooks import node_line
+from lox.interpreter import Interpreter
+from lox.lox_function import LoxFunction
+
+DEFAULT_INTERVAL = 0.005
+SCRIPT = "<script>"
+
+# One Lox call frame in a sample: the function's name and the line it is executing, if known.
+Frame = tuple[str, int | None]
+
+
+def _node_codes() -> frozenset[CodeType]:
+    # Tree-walker methods whose `expr`, `stmt` or `statement` local is the node being executed.
+    codes = set()
+    for value in vars(Interpreter).values():
+        code = getattr(value, "__code__", None)
+        if code is not None and {"expr", "stmt", "statement"} & set(code.co_varnames):
+            codes.add(code)
+    return frozenset(codes)
+
+
+class Profiler:
+    """Statistical profiler for the tree-walking interpreter.
+
+    A background thread wakes up every `interval` seconds and walks the interpreter thread's Python stack. Each
+    `LoxFunction.call_frame` frame marks a Lox call, and the innermost node being visited within it gives the Lox line.
+    Nothing is installed in the interpreter itself, so an unprofiled run is unaffected and a profiled one only pays for
+    the samples. Each sample is weighted by the time since the previous one.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL) -> None:
+        self.interval = interval
+        self.samples = 0
+        self.elapsed = 0.0
+        self.stacks: defaultdict[tuple[Frame, ...], float] = defaultdict(float)
+        self.__node_codes = _node_codes()
+        self.__call_code = LoxFunction.call_frame.__code__
+        self.__lines: dict[e.Expr | s.Stmt, int | None] = {}
+        self.__stopped = threading.Event()
+        self.__thread: threading.Thread | None = None
+        self.__target = 0
+
+    def __enter__(self) -> Profiler:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self.__target = threading.get_ident()
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__sample_loop, name="lox-profiler", daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __sample_loop(self) -> None:
+        previous = time.perf_counter()
+        while not self.__stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.__target)  # pylint: disable=protected-access
+            now = time.perf_counter()
+            if frame is not None and (stack := self.__lox_stack(frame)):
+                self.stacks[stack] += now - previous
+                self.samples += 1
+                self.elapsed += now - previous
+            previous = now
+
+    def __lox_stack(self, frame: FrameType | None) -> tuple[Frame, ...]:
+        frames: list[Frame] = []
+        line: int | None = None
+        in_interpreter = False
+        while frame is not None:
+            code = frame.f_code
+            if code is self.__call_code:
+                function = frame.f_locals.get("self")
+                frames.append((function.name.lexeme if isinstance(function, LoxFunction) else "?", line))
+                line = None
+            elif code in self.__node_codes:
+                in_interpreter = True
+                if line is None:
+                    local = frame.f_locals
+                    node = local.get("expr") or local.get("stmt") or local.get("statement")
+                    line = self.__line(node)
+            frame = frame.f_back
+        if not in_interpreter:
+            return ()
+        frames.append((SCRIPT, line))
+        frames.reverse()
+        return tuple(frames)
+
+    def __line(self, node: Any) -> int | None:
+        if not isinstance(node, (e.Expr, s.Stmt)):
+            return None
+        if node not in self.__lines:
+            self.__lines[node] = node_line(node)
+        return self.__lines[node]
+
+    def report(self, file: TextIO = sys.stderr) -> None:
+        functions_self: defaultdict[str, float] = defaultdict(float)
+        functions_total: defaultdict[str, float] = defaultdict(float)
+        lines_self: defaultdict[int, float] = defaultdict(float)
+        lines_total: defaultdict[int, float] = defaultdict(float)
+        for stack, seconds in self.stacks.items():
+            leaf, leaf_line = stack[-1]
+            functions_self[leaf] += seconds
+            if leaf_line is not None:
+                lines_self[leaf_line] += seconds
+            for name in {name for name, _ in stack}:
+                functions_total[name] += seconds
+            for line in {line for _, line in stack if line is not None}:
+                lines_total[line] += seconds
+
+        print(f"{self.samples} samples over {self.elapsed:.3f}s", file=file)
+        self.__table("function", functions_self, functions_total, file)
+        self.__table("line", lines_self, lines_total, file)
+
+    def __table(
+        self, title: str, self_time: defaultdict[Any, float], total_time: defaultdict[Any, float], file: TextIO
+    ) -> None:
+        print(f"\n{'self':>9} {'%':>6} {'total':>9} {'%':>6}  {title}", file=file)
+        elapsed = self.elapsed or 1.0
+        for key, total in sorted(total_time.items(), key=lambda item: (-self_time[item[0]], -item[1])):
+            own = self_time[key]
+            print(f"{own:8.3f}s {own / elapsed:6.1%} {total:8.3f}s {total / elapsed:6.1%}  {key}", file=file)
+
+    def write_collapsed(self, file: TextIO) -> None:
+        """Writes one `<script>;outer;inner <microseconds>` line per distinct stack, as read by flamegraph.pl."""
+        collapsed: defaultdict[str, float] = defaultdict(float)
+        for stack, seconds in self.stacks.items():
+            collapsed[";".join(name for name, _ in stack)] += seconds
+        for stack_names, seconds in sorted(collapsed.items()):
+            print(f"{stack_names} {round(seconds * 1_000_000)}", file=file)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from typing import Any, Callable, TextIO
+
+import lox.expr as e
+from lox.runtime import STRING_TYPES, concat
+from lox.token_type import TokenType
+
+# A `Binary` node is specialized after this many consecutive evaluations with operands of the same kind, and is left
+# generic for good once its fast path has failed `MAX_DEOPTS` times.
+QUICKEN_AFTER = 8
+MAX_DEOPTS = 4
+
+# Returned by a fast path whose guard failed; the caller then falls back to the generic evaluation.
+MISS = object()
+
+FastPath = Callable[[Any, Any], Any]
+
+
+def _add(left: Any, right: Any) -> Any:
+    return left + right if type(left) is float and type(right) is float else MISS
+
+
+def _subtract(left: Any, right: Any) -> Any:
+    return left - right if type(left) is float and type(right) is float else MISS
+
+
+def _multiply(left: Any, right: Any) -> Any:
+    return left * right if type(left) is float and type(right) is float else MISS
+
+
+def _divide(left: Any, right: Any) -> Any:
+    return left / right if type(left) is float and type(right) is float else MISS
+
+
+def _greater(left: Any, right: Any) -> Any:
+    return left > right if type(left) is float and type(right) is float else MISS
+
+
+def _greater_equal(left: Any, right: Any) -> Any:
+    return left >= right if type(left) is float and type(right) is float else MISS
+
+
+def _less(left: Any, right: Any) -> Any:
+    return left < right if type(left) is float and type(right) is float else MISS
+
+
+def _less_equal(left: Any, right: Any) -> Any:
+    return left <= right if type(left) is float and type(right) is float else MISS
+
+
+def _equal(left: Any, right: Any) -> Any:
+    return left == right if type(left) is float and type(right) is float else MISS
+
+
+def _not_equal(left: Any, right: Any) -> Any:
+    return left != right if type(left) is float and type(right) is float else MISS
+
+
+def _concat(left: Any, right: Any) -> Any:
+    return concat(left, right) if isinstance(left, STRING_TYPES) and isinstance(right, STRING_TYPES) else MISS
+
+
+FLOAT_PATHS: dict[TokenType, FastPath] = {
+    TokenType.PLUS: _add,
+    TokenType.MINUS: _subtract,
+    TokenType.STAR: _multiply,
+    TokenType.SLASH: _divide,
+    TokenType.GREATER: _greater,
+    TokenType.GREATER_EQUAL: _greater_equal,
+    TokenType.LESS: _less,
+    TokenType.LESS_EQUAL: _less_equal,
+    TokenType.EQUAL_EQUAL: _equal,
+    TokenType.BANG_EQUAL: _not_equal,
+}
+
+
+class BinarySite:
+    """Specialization state of one `Binary` node, kept by the interpreter that evaluates it."""
+
+    __slots__ = ("expr", "kind", "streak", "specialized", "generic", "hits", "deopts")
+
+    def __init__(self, expr: e.Binary) -> None:
+        self.expr = expr
+        self.kind: str | None = None
+        self.streak = 0
+        self.specialized: str | None = None
+        self.generic = 0
+        self.hits = 0
+        self.deopts = 0
+
+    def observe(self, left: Any, right: Any) -> FastPath | None:
+        """Records a generic evaluation, and returns a fast path once the operand kinds have been stable long enough."""
+        self.generic += 1
+        if self.deopts >= MAX_DEOPTS:
+            return None
+
+        type_ = self.expr.operator.type_
+        if type(left) is float and type(right) is float:
+            kind, fast = "float", FLOAT_PATHS.get(type_)
+        elif type_ == TokenType.PLUS and isinstance(left, STRING_TYPES) and isinstance(right, STRING_TYPES):
+            kind, fast = "string", _concat
+        else:
+            kind, fast = None, None
+
+        if fast is None or kind != self.kind:
+            self.kind = kind
+            self.streak = 1 if fast is not None else 0
+            return None
+        self.streak += 1
+        if self.streak < QUICKEN_AFTER:
+            return None
+        self.streak = 0
+        self.specialized = kind
+        return fast
+
+    def deoptimize(self) -> None:
+        self.deopts += 1
+        self.kind = self.specialized = None
+        self.streak = 0
+
+    def counting(self, fast: FastPath) -> FastPath:
+        """Wraps `fast` so that `hits` counts the evaluations it handles, for `report`."""
+
+        def counted(left: Any, right: Any) -> Any:
+            result = fast(left, right)
+            if result is not MISS:
+                self.hits += 1
+            return result
+
+        return counted
+
+
+def report(sites: list[BinarySite], file: TextIO) -> None:
+    print(f"{'line':>6}  {'op':<3} {'kind':<11} {'fast':>10} {'generic':>10} {'deopts':>6}", file=file)
+    for site in sorted(sites, key=lambda site: (site.expr.operator.line, -site.hits - site.generic)):
+        operator = site.expr.operator
+        kind = site.specialized or ("megamorphic" if site.deopts >= MAX_DEOPTS else "-")
+        print(
+            f"{operator.line:>6}  {operator.lexeme:<3} {kind:<11} {site.hits:>10} {site.generic:>10} {site.deopts:>6}",
+            file=file,
+        )
@@ -1,9 +1,13 @@
+from __future__ import annotations
+
 from contextlib import contextmanager
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Generator
+from typing import Generator, Sequence
 
 import lox.expr as e
 import lox.stmt as s
+from lox.environment import CELL, FREE, GLOBAL, LOCAL, FunctionLayout
 from lox.errors import handler
 from lox.expr import Get
 from lox.interpreter import Interpreter
@@ -23,21 +27,84 @@ class ClassType(Enum):
     CLASS = "class"
 
 
+class ScopeType(Enum):
+    BLOCK = "block"
+    FUNCTION = "function"
+
+
+@dataclass(eq=False)
+class _Local:
+    slot: int
+    # The statement that declares the variable, or None for a parameter or the receiver.
+    declaration: s.Var | s.Function | s.Class | None = None
+    defined: bool = False
+    captured: bool = False
+    # Uses from the frame that declares the variable; how they reach it depends on whether it ends up captured.
+    uses: list[e.Expr] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class _Scope:
+    type_: ScopeType
+    # Frame slot of the scope's first local.
+    base: int = 0
+    locals: dict[str, _Local] = field(default_factory=dict)
+    # For a function: the index in its cells of each variable it captures, and where that variable comes from.
+    free: dict[_Local, int] = field(default_factory=dict)
+    captures: list[tuple[int, int]] = field(default_factory=list)
+
+    def capture(self, local: _Local, kind: int, index: int) -> int:
+        if (free := self.free.get(local)) is None:
+            free = self.free[local] = len(self.captures)
+            self.captures.append((kind, index))
+        return free
+
+
 class Resolver(e.Visitor[None], s.Visitor[None]):
+    """Resolves every variable use to a (kind, index) location, as described in `lox.environment`. A name that is not
+    declared in any enclosing scope is a global, and gets a slot in the interpreter's table of globals.
+
+    Each function gets one frame. A block that is not at the top level shares the frame of the code around it, its
+    locals stacked on top of the ones already declared there, and is marked flat. A function captures only the
+    variables of enclosing functions that it, or a function nested in it, refers to; each of those is kept in a `Cell`
+    by the frame that declares it, so that assignments are seen on both sides.
+    """
+
     def __init__(self, interpreter: Interpreter) -> None:
         self.__interpreter = interpreter
-        self.__scopes: list[dict[str, bool]] = []
+        self.__scopes: list[_Scope] = []
         self.__current_function = FunctionType.NONE
         self.__current_class = ClassType.NONE
 
     @contextmanager
-    def use_scope(self) -> Generator[None, None, None]:
+    def use_scope(
+        self, type_: ScopeType, node: s.Block | s.For | s.Function | None = None
+    ) -> Generator[None, None, None]:
+        parent = self.__scopes[-1] if self.__scopes else None
+        flat = type_ == ScopeType.BLOCK and parent is not None
+        scope = _Scope(type_, parent.base + len(parent.locals) if flat else 0)  # type: ignore[union-attr]
         try:
-            self.__scopes.append({})
+            self.__scopes.append(scope)
             yield
         finally:
             self.__scopes.pop()
 
+        # Only once a scope has ended is it known which of its locals are captured.
+        for local in scope.locals.values():
+            kind = CELL if local.captured else LOCAL
+            for expr in local.uses:
+                self.__interpreter.resolve(expr, kind, local.slot)
+            if local.captured and local.declaration is not None:
+                self.__interpreter.capture(local.declaration)
+        if flat:
+            self.__interpreter.flatten(node, bool(scope.locals))  # type: ignore[arg-type]
+        elif type_ == ScopeType.FUNCTION:
+            layout = FunctionLayout(
+                tuple(scope.captures),
+                tuple(local.slot for local in scope.locals.values() if local.captured and local.declaration is None),
+            )
+            self.__interpreter.lay_out(node, layout)  # type: ignore[arg-type]
+
     @contextmanager
     def function(self, type_: FunctionType) -> Generator[None, None, None]:
         try:
@@ -56,55 +123,75 @@ class Resolver(e.Visitor[None], s.Visitor[None]):
         finally:
             self.__current_class = enclosing_class
 
-    def resolve(self, stmt: list[s.Stmt | e.Expr] | s.Stmt | e.Expr) -> None:
-        if not isinstance(stmt, list):
-            stmt = [stmt]
-        for s in stmt:
-            s.accept(self)
+    def resolve(self, stmt: Sequence[s.Stmt | e.Expr | None] | s.Stmt | e.Expr) -> None:
+        for node in stmt if isinstance(stmt, Sequence) else [stmt]:
+            if node is not None:
+                node.accept(self)
 
     def visit_block(self, stmt: s.Block) -> None:
-        with self.use_scope():
+        with self.use_scope(ScopeType.BLOCK, stmt):
             self.resolve(stmt.statments)
 
     def visit_var(self, stmt: s.Var) -> None:
-        self.__declare(stmt.name)
+        self.__declare(stmt.name, stmt)
         if stmt.initializer is not None:
             self.resolve(stmt.initializer)
         self.__define(stmt.name)
 
-    def __declare(self, name: Token) -> None:
+    def __declare(self, name: Token, declaration: s.Var | s.Function | s.Class | None = None) -> None:
         if len(self.__scopes) > 0:
-            if name.lexeme in self.__scopes[-1]:
+            scope = self.__scopes[-1]
+            if name.lexeme in scope.locals:
                 handler.error_token(name, "Already a variable with this name in this scope.")
-            self.__scopes[-1][name.lexeme] = False
+            scope.locals[name.lexeme] = _Local(scope.base + len(scope.locals), declaration)
 
     def __define(self, name: Token) -> None:
         if len(self.__scopes) > 0:
-            self.__scopes[-1][name.lexeme] = True
+            self.__scopes[-1].locals[name.lexeme].defined = True
 
     def visit_variable(self, expr: e.Variable) -> None:
-        if len(self.__scopes) > 0 and not self.__scopes[-1][expr.name.lexeme]:
+        if len(self.__scopes) > 0 and (local := self.__scopes[-1].locals.get(expr.name.lexeme)) and not local.defined:
             handler.error_token(expr.name, "Can't read local variable in its own initializer.")
 
         self.__resolve_local(expr, expr.name)
 
     def __resolve_local(self, expr: e.Expr, name: Token) -> None:
-        for idx, scope in enumerate(reversed(self.__scopes)):
-            if name.lexeme in scope:
-                self.__interpreter.resolve(expr, idx)
+        functions: list[_Scope] = []
+        for scope in reversed(self.__scopes):
+            if (local := scope.locals.get(name.lexeme)) is not None:
+                break
+            if scope.type_ == ScopeType.FUNCTION:
+                functions.append(scope)
+        else:
+            self.__interpreter.resolve(expr, GLOBAL, self.__interpreter.globals.slot(name.lexeme))
+            return
+
+        if not functions:
+            local.uses.append(expr)
+            return
+
+        # Every function between the use and the declaration captures the variable, each from the one around it.
+        local.captured = True
+        kind, index = CELL, local.slot
+        for function in reversed(functions):
+            kind, index = FREE, function.capture(local, kind, index)
+        self.__interpreter.resolve(expr, kind, index)
 
     def visit_assign(self, expr: e.Assign) -> None:
         self.resolve(expr.value)
         self.__resolve_local(expr, expr.name)
 
     def visit_function(self, stmt: s.Function) -> None:
-        self.__declare(stmt.name)
+        self.__declare(stmt.name, stmt)
         self.__define(stmt.name)
 
         self.__resolve_function(stmt, FunctionType.FUNCTION)
 
-    def __resolve_function(self, function: s.Stmt, type_: FunctionType) -> None:
-        with self.function(type_), self.use_scope():
+    def __resolve_function(self, function: s.Function, type_: FunctionType) -> None:
+        with self.function(type_), self.use_scope(ScopeType.FUNCTION, function):
+            # Slot 0 holds the receiver. A plain function has none, and its slot can't be named.
+            receiver = "" if type_ == FunctionType.FUNCTION else "this"
+            self.__scopes[-1].locals[receiver] = _Local(0, defined=True)
             for param in function.params:
                 self.__declare(param)
                 self.__define(param)
@@ -135,6 +222,22 @@ class Resolver(e.Visitor[None], s.Visitor[None]):
         self.resolve(stmt.condition)
         self.resolve(stmt.body)
 
+    def visit_for(self, stmt: s.For) -> None:
+        if isinstance(stmt.initializer, s.Var):
+            with self.use_scope(ScopeType.BLOCK, stmt):
+                self.__resolve_for(stmt)
+        else:
+            self.__resolve_for(stmt)
+
+    def __resolve_for(self, stmt: s.For) -> None:
+        if stmt.initializer is not None:
+            self.resolve(stmt.initializer)
+        if stmt.condition is not None:
+            self.resolve(stmt.condition)
+        self.resolve(stmt.body)
+        if stmt.increment is not None:
+            self.resolve(stmt.increment)
+
     def visit_binary(self, expr: e.Binary) -> None:
         self.resolve(expr.left)
         self.resolve(expr.right)
@@ -160,21 +263,19 @@ class Resolver(e.Visitor[None], s.Visitor[None]):
 
     def visit_class(self, stmt: s.Class) -> None:
         with self.klass(ClassType.CLASS):
-            self.__declare(stmt.name)
+            self.__declare(stmt.name, stmt)
             self.__define(stmt.name)
 
-            with self.use_scope():
-                self.__scopes[-1]["this"] = True
-                for method in stmt.methods:
-                    declaration = FunctionType.METHOD if method.name.lexeme != "init" else FunctionType.INITIALIZER
-                    self.__resolve_function(method, declaration)
+            for method in stmt.methods:
+                declaration = FunctionType.METHOD if method.name.lexeme != "init" else FunctionType.INITIALIZER
+                self.__resolve_function(method, declaration)
 
     def visit_get(self, expr: e.Get) -> None:
         self.resolve(expr.obj)
 
     def visit_set(self, expr: e.Set) -> None:
         self.resolve(expr.value)
-        self.resolve(expr.object)
+        self.resolve(expr.obj)
 
     def visit_this(self, expr: e.This) -> None:
         if self.__current_class == ClassType.NONE:
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from lox.lox_callable import LoxCallable
+
+if TYPE_CHECKING:
+    from lox.interpreter import Interpreter
+
+
+class ClockCallable(LoxCallable):
+    def __init__(self) -> None:
+        self.arity = 0
+
+    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
+        return time.time()
+
+    def __str__(self) -> str:
+        return "<native fn>"
+
+
+# Concatenations shorter than this are plain `str` copies; longer ones build a `Rope`.
+ROPE_THRESHOLD = 1024
+
+
+class Rope:
+    """A Lox string built by `+`, kept as a list of pieces until its text is needed.
+
+    Appending to a rope shares its piece list with the result, so `s = s + piece` in a loop takes amortized constant
+    time instead of copying `s`. A rope only ever sees its first `count` pieces, which keeps sharing safe when two
+    strings are built from the same prefix. Comparing, hashing or printing a rope joins the pieces once.
+    """
+
+    __slots__ = ("__parts", "__count", "__text")
+
+    def __init__(self, parts: list[str], count: int) -> None:
+        self.__parts = parts
+        self.__count = count
+        self.__text: str | None = None
+
+    def append(self, piece: str) -> Rope:
+        parts = self.__parts
+        if len(parts) != self.__count:
+            parts = parts[: self.__count]
+        parts.append(piece)
+        return Rope(parts, self.__count + 1)
+
+    def __str__(self) -> str:
+        if self.__text is None:
+            self.__text = "".join(self.__parts[: self.__count])
+            self.__parts = [self.__text]
+            self.__count = 1
+        return self.__text
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (str, Rope)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+
+STRING_TYPES = (str, Rope)
+
+
+def concat(left: str | Rope, right: str | Rope) -> str | Rope:
+    if isinstance(right, Rope):
+        right = str(right)
+    if isinstance(left, Rope):
+        return left.append(right)
+    if len(left) + len(right) < ROPE_THRESHOLD:
+        return left + right
+    return Rope([left, right], 2)
+
+
+def is_truthy(value: Any) -> bool:
+    if value is None:
+        return False
+
+    if isinstance(value, bool):
+        return bool(value)
+
+    return True
+
+
+def is_equal(a: Any, b: Any) -> bool:
+    if a is None and b is None:
+        return True
+
+    return bool(a == b)
+
+
+def stringify(value: Any) -> str:
+    if value is None:
+        return "nil"
+    if isinstance(value, float):
+        text = str(value)
+        if text.endswith(".0"):
+            text = text.replace(".0", "")
+        return text
+
+    return str(value)
@@ -1,7 +1,10 @@
-from typing import Any, Generator
+from __future__ import annotations
+
+import re
+from typing import Any, Generator, TextIO
 
 from lox.errors import handler
-from lox.token_type import TokenType
+from lox.token_type import KEYWORDS, TokenType
 from lox.tokens import Token
 
 
@@ -12,6 +15,10 @@ class Scanner:
         self.line = 1
         self.tokens: list[Token] = []
 
+    @classmethod
+    def from_stream(cls, stream: TextIO) -> Scanner:
+        return cls(stream.read())
+
     @property
     def at_end(self) -> bool:
         return self.current >= len(self.source)
@@ -40,9 +47,6 @@ class Scanner:
                 self.line += 1
             case '"':
                 return self.string()
-            case "o":
-                if self.match("r"):
-                    return self.add_token(TokenType.OR)
             case _ as c:
                 if c.isdigit():
                     return self.number()
@@ -56,7 +60,7 @@ class Scanner:
             self.advance()
 
         text = self.source[self.start : self.current]
-        return self.add_token(TokenType(text) if TokenType.contains(text) else TokenType.IDENTIFIER)
+        return self.add_token(KEYWORDS.get(text, TokenType.IDENTIFIER))
 
     def number(self) -> Token:
         while self.peek.isdigit():
@@ -115,3 +119,103 @@ class Scanner:
     def add_token(self, type_: TokenType, literal: Any | None = None) -> Token:
         text = self.source[self.start : self.current]
         return Token(type_, text, literal, self.line)
+
+
+# ASCII-only fast path for `FastScanner`; leading blanks are consumed as part of the next match. A lookahead rejects
+# identifiers and numbers that run into a non-ASCII character, because `str.isalnum`/`str.isdigit` accept those and
+# only `Scanner.scan_token` treats them exactly.
+TOKEN_PATTERN = re.compile(
+    r"""
+    [ \t\r]*
+    (?:(?P<newline>\n)
+    |(?P<comment>//[^\n]*)
+    |(?P<number>(?>[0-9]+(?:\.[0-9]+)?))(?![^\x00-\x7f]|\.[^\x00-\x7f])
+    |(?P<identifier>(?>[A-Za-z][A-Za-z0-9]*))(?![^\x00-\x7f])
+    |(?P<string>"[^"]*")
+    |(?P<open_string>")
+    |(?P<operator>!=|==|<=|>=|[(){},.\-+;*/!=<>])
+    |(?P<end>\Z))
+    """,
+    re.VERBOSE,
+)
+
+CHUNK_SIZE = 1 << 16
+
+OPERATORS: dict[str, TokenType] = {
+    str(type_): type_ for type_ in TokenType if isinstance(type_.value, str) and not type_.value.isalpha()
+}
+
+
+class FastScanner(Scanner):
+    """Produces the same tokens and errors as `Scanner`, one regex match per token instead of one call per character.
+
+    Whatever the pattern does not cover, such as non-ASCII identifiers, unterminated strings or unexpected characters,
+    is handed to `Scanner.scan_token` one token at a time.
+
+    Built with `from_stream`, the source is read `chunk_size` characters at a time and only complete lines are
+    scanned, so the buffer never holds more than a chunk plus the line, or string literal, that straddles it.
+    """
+
+    def __init__(self, source: str, stream: TextIO | None = None, chunk_size: int = CHUNK_SIZE) -> None:
+        super().__init__(source)
+        self.stream = stream
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_stream(cls, stream: TextIO, chunk_size: int = CHUNK_SIZE) -> FastScanner:
+        return cls("", stream, chunk_size)
+
+    def __iter__(self) -> Generator[Token, None, None]:
+        while self.stream is not None:
+            chunk = self.stream.read(self.chunk_size)
+            self.source = self.source[self.current :] + chunk
+            self.start = self.current = 0
+            if not chunk:
+                break
+            yield from self.__scan(self.source.rfind("\n") + 1, final=False)
+
+        yield from self.__scan(len(self.source), final=True)
+        yield Token(TokenType.EOF, "", None, self.line)
+
+    def __scan(self, limit: int, final: bool) -> Generator[Token, None, None]:
+        """Scans `self.source` up to `limit`. Unless `final`, stops at a string literal that may close after it."""
+        source = self.source
+        match = TOKEN_PATTERN.match
+        line = self.line
+        position = self.current
+
+        while position < limit:
+            found = match(source, position, limit)
+            if found is None or found.lastgroup == "open_string":
+                if found is not None:
+                    position = found.start()
+                    if not final:
+                        break
+                self.start = self.current = position
+                self.line = line
+                token = self.scan_token()
+                position = self.current
+                line = self.line
+                if token:
+                    yield token
+                continue
+
+            kind = found.lastgroup
+            assert kind is not None  # Every alternative of the pattern is a named group.
+            text = found.group(kind)
+            position = found.end(kind)
+
+            if kind == "identifier":
+                yield Token(KEYWORDS.get(text, TokenType.IDENTIFIER), text, None, line)
+            elif kind == "operator":
+                yield Token(OPERATORS[text], text, None, line)
+            elif kind == "number":
+                yield Token(TokenType.NUMBER, text, float(text), line)
+            elif kind == "newline":
+                line += 1
+            elif kind == "string":
+                line += text.count("\n")
+                yield Token(TokenType.STRING, text, text[1:-1], line)
+
+        self.start = self.current = position
+        self.line = line
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import abc
 from dataclasses import dataclass
-from typing import Protocol, TypeVar
+from typing import Any, Protocol, TypeVar
 
 import lox.expr as e
 from lox.tokens import Token
@@ -10,10 +10,14 @@ from lox.tokens import Token
 T = TypeVar("T", covariant=True)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Stmt(abc.ABC):
     """Base class"""
 
+    def __reduce__(self) -> tuple[type[Stmt], tuple[Any, ...]]:
+        # Pickled nodes are rebuilt through __init__, which is much faster than the slots' generated __setstate__.
+        return type(self), tuple([getattr(self, name) for name in self.__match_args__])
+
     @abc.abstractmethod
     def accept(self, visitor: Visitor[T]) -> T:
         pass
@@ -38,6 +42,9 @@ class Visitor(Protocol[T]):
     def visit_while(self, stmt: While) -> T:
         pass
 
+    def visit_for(self, stmt: For) -> T:
+        pass
+
     def visit_function(self, stmt: Function) -> T:
         pass
 
@@ -48,7 +55,7 @@ class Visitor(Protocol[T]):
         pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Expression(Stmt):
     expression: e.Expr
 
@@ -56,7 +63,7 @@ class Expression(Stmt):
         return visitor.visit_expression(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Print(Stmt):
     expression: e.Expr
 
@@ -64,7 +71,7 @@ class Print(Stmt):
         return visitor.visit_print(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Var(Stmt):
     name: Token
     initializer: e.Expr | None
@@ -73,7 +80,7 @@ class Var(Stmt):
         return visitor.visit_var(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Block(Stmt):
     statments: list[Stmt | None]
 
@@ -81,7 +88,7 @@ class Block(Stmt):
         return visitor.visit_block(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class If(Stmt):
     condition: e.Expr
     then_branch: Stmt
@@ -91,7 +98,7 @@ class If(Stmt):
         return visitor.visit_if(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class While(Stmt):
     condition: e.Expr
     body: Stmt
@@ -100,7 +107,20 @@ class While(Stmt):
         return visitor.visit_while(self)
 
 
-@dataclass(frozen=True)
+# A `var` initializer is scoped to the loop, like the block `for` used to be desugared into; there is one variable for
+# the whole loop, not one per iteration.
+@dataclass(frozen=True, eq=False, slots=True)
+class For(Stmt):
+    initializer: Stmt | None
+    condition: e.Expr | None
+    increment: e.Expr | None
+    body: Stmt
+
+    def accept(self, visitor: Visitor[T]) -> T:
+        return visitor.visit_for(self)
+
+
+@dataclass(frozen=True, eq=False, slots=True)
 class Function(Stmt):
     name: Token
     params: list[Token]
@@ -110,7 +130,7 @@ class Function(Stmt):
         return visitor.visit_function(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Return(Stmt):
     keyword: Token
     value: e.Expr | None
@@ -119,7 +139,7 @@ class Return(Stmt):
         return visitor.visit_return(self)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, eq=False, slots=True)
 class Class(Stmt):
     name: Token
     methods: list[Function]
@@ -61,3 +61,26 @@ class TokenType(Enum):
     @classmethod
     def contains(cls, key: str) -> bool:
         return key in cls.types()
+
+
+KEYWORDS: dict[str, TokenType] = {
+    str(type_): type_
+    for type_ in (
+        TokenType.AND,
+        TokenType.CLASS,
+        TokenType.ELSE,
+        TokenType.FALSE,
+        TokenType.FUN,
+        TokenType.FOR,
+        TokenType.IF,
+        TokenType.NIL,
+        TokenType.OR,
+        TokenType.PRINT,
+        TokenType.RETURN,
+        TokenType.SUPER,
+        TokenType.THIS,
+        TokenType.TRUE,
+        TokenType.VAR,
+        TokenType.WHILE,
+    )
+}
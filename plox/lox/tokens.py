@@ -1,15 +1,20 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 from typing import Any
 
 from lox.token_type import TokenType
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Token:
     type_: TokenType
     lexeme: str
     literal: Any
     line: int
 
+    def __reduce__(self) -> tuple[type[Token], tuple[TokenType, str, Any, int]]:
+        return Token, (self.type_, self.lexeme, self.literal, self.line)
+
     def __str__(self) -> str:
         return f"{self.type_} {self.lexeme} {self.literal}"
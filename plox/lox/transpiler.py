@@ -0,0 +1,662 @@
+from __future__ import annotations
+
+import itertools
+import math
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MethodType
+from typing import Any, Callable, Generator, Self
+
+import lox.expr as e
+import lox.stmt as s
+from lox.environment import UNDEFINED, Cell, GlobalEnvironment, undefined
+from lox.errors import LoxRuntimeError, handler
+from lox.interpreter import Interpreter
+from lox.lox_callable import LoxCallable
+from lox.lox_class import LoxClass, LoxInstance, PropertyCache
+from lox.runtime import STRING_TYPES, concat, stringify
+from lox.token_type import TokenType
+from lox.tokens import Token
+
+ENTRY_POINT = "__lox_main__"
+
+NUMERIC_OPERATORS = {
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+    TokenType.SLASH: "/",
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+# Operators whose result is always a bool, so a condition built from them needs no truthiness test.
+BOOLEAN_OPERATORS = {
+    TokenType.GREATER,
+    TokenType.GREATER_EQUAL,
+    TokenType.LESS,
+    TokenType.LESS_EQUAL,
+    TokenType.EQUAL_EQUAL,
+    TokenType.BANG_EQUAL,
+}
+
+
+class PythonFunction(LoxCallable):
+    """A Lox function or method whose body has been transpiled to the Python function `raw`."""
+
+    def __init__(self, raw: Callable[..., Any], name: str, arity: int, is_initializer: bool) -> None:
+        self.raw = raw
+        self.fn = raw
+        self.name = name
+        self.arity = arity
+        self.is_initializer = is_initializer
+
+    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
+        return self.fn(*arguments)
+
+    def call_method(self, interpreter: Interpreter, receiver: LoxInstance, arguments: list[Any]) -> Any:
+        return self.raw(receiver, *arguments)
+
+    def bind(self, instance: LoxInstance) -> Self:
+        method = type(self)(self.raw, self.name, self.arity, self.is_initializer)
+        method.fn = MethodType(self.raw, instance)
+        return method
+
+    def __str__(self) -> str:
+        return f"<fn {self.name}>"
+
+
+@dataclass(eq=False)
+class _Function:
+    enclosing: _Function | None
+    free: list[_Binding] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class _Binding:
+    name: str
+    function: _Function
+    captured: bool = False
+
+
+class _ScopeAnalyzer(e.Visitor[None], s.Visitor[None]):
+    """Mirrors the `Resolver`'s scoping to give every local declaration its own Python name.
+
+    It also records which locals are captured by a nested function, and which outer locals each function needs.
+    """
+
+    def __init__(self) -> None:
+        self.declarations: dict[int, _Binding] = {}
+        self.references: dict[int, _Binding | None] = {}
+        self.functions: dict[int, _Function] = {}
+        self.__scopes: list[dict[str, _Binding]] = []
+        self.__function = _Function(None)
+        self.__ids = itertools.count()
+
+    def analyze(self, statements: list[s.Stmt | None] | list[s.Stmt]) -> None:
+        for stmt in statements:
+            if stmt is not None:
+                stmt.accept(self)
+
+    def __declare(self, node: object, lexeme: str) -> None:
+        if not self.__scopes:
+            return
+        binding = _Binding(f"v{next(self.__ids)}_{lexeme}", self.__function)
+        self.__scopes[-1][lexeme] = binding
+        self.declarations[id(node)] = binding
+
+    def __reference(self, node: e.Expr, lexeme: str) -> None:
+        for scope in reversed(self.__scopes):
+            if (binding := scope.get(lexeme)) is not None:
+                break
+        else:
+            self.references[id(node)] = None
+            return
+
+        self.references[id(node)] = binding
+        function = self.__function
+        while function is not binding.function:
+            binding.captured = True
+            if binding not in function.free:
+                function.free.append(binding)
+            function = function.enclosing  # type: ignore[assignment]
+
+    def __resolve_function(self, stmt: s.Function, this: bool) -> None:
+        enclosing = self.__function
+        self.__function = self.functions[id(stmt)] = _Function(enclosing)
+        self.__scopes.append({})
+        if this:
+            self.__declare(stmt.name, "this")
+        for param in stmt.params:
+            self.__declare(param, param.lexeme)
+        self.analyze(stmt.body)
+        self.__scopes.pop()
+        self.__function = enclosing
+
+    def visit_expression(self, stmt: s.Expression) -> None:
+        stmt.expression.accept(self)
+
+    def visit_print(self, stmt: s.Print) -> None:
+        stmt.expression.accept(self)
+
+    def visit_var(self, stmt: s.Var) -> None:
+        if stmt.initializer is not None:
+            stmt.initializer.accept(self)
+        self.__declare(stmt, stmt.name.lexeme)
+
+    def visit_block(self, stmt: s.Block) -> None:
+        self.__scopes.append({})
+        self.analyze(stmt.statments)
+        self.__scopes.pop()
+
+    def visit_if(self, stmt: s.If) -> None:
+        stmt.condition.accept(self)
+        stmt.then_branch.accept(self)
+        if stmt.else_branch is not None:
+            stmt.else_branch.accept(self)
+
+    def visit_while(self, stmt: s.While) -> None:
+        stmt.condition.accept(self)
+        stmt.body.accept(self)
+
+    def visit_for(self, stmt: s.For) -> None:
+        scoped = isinstance(stmt.initializer, s.Var)
+        if scoped:
+            self.__scopes.append({})
+        for child in (stmt.initializer, stmt.condition, stmt.body, stmt.increment):
+            if child is not None:
+                child.accept(self)
+        if scoped:
+            self.__scopes.pop()
+
+    def visit_function(self, stmt: s.Function) -> None:
+        self.__declare(stmt, stmt.name.lexeme)
+        self.__resolve_function(stmt, this=False)
+
+    def visit_return(self, stmt: s.Return) -> None:
+        if stmt.value is not None:
+            stmt.value.accept(self)
+
+    def visit_class(self, stmt: s.Class) -> None:
+        self.__declare(stmt, stmt.name.lexeme)
+        for method in stmt.methods:
+            self.__resolve_function(method, this=True)
+
+    def visit_binary(self, expr: e.Binary) -> None:
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_grouping(self, expr: e.Grouping) -> None:
+        expr.expression.accept(self)
+
+    def visit_literal(self, expr: e.Literal) -> None:
+        pass
+
+    def visit_unary(self, expr: e.Unary) -> None:
+        expr.right.accept(self)
+
+    def visit_variable(self, expr: e.Variable) -> None:
+        self.__reference(expr, expr.name.lexeme)
+
+    def visit_assign(self, expr: e.Assign) -> None:
+        expr.value.accept(self)
+        self.__reference(expr, expr.name.lexeme)
+
+    def visit_logical(self, expr: e.Logical) -> None:
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_call(self, expr: e.Call) -> None:
+        expr.callee.accept(self)
+        for argument in expr.arguments:
+            argument.accept(self)
+
+    def visit_get(self, expr: e.Get) -> None:
+        expr.obj.accept(self)
+
+    def visit_set(self, expr: e.Set) -> None:
+        expr.obj.accept(self)
+        expr.value.accept(self)
+
+    def visit_this(self, expr: e.This) -> None:
+        self.__reference(expr, "this")
+
+
+class Transpiler(e.Visitor[str], s.Visitor[None]):
+    """Translates a resolved program into the source of a Python module.
+
+    Lox locals become Python locals with unique names. A local captured by a nested function is stored in a
+    one-element list created when its declaration runs, and nested functions receive those lists as keyword-only
+    defaults, so closures created in a loop each see their own variable, exactly like the tree-walker's `Cell`s.
+    Globals are read and written through the interpreter's global cells, which the module gets as constants. Type
+    checks are emitted inline and raise `LoxRuntimeError` with the offending token, which is looked up in the `_T`
+    table. `calls` maps each line of the module that makes a Lox call to that call's parenthesis.
+    """
+
+    def __init__(self, globals_: GlobalEnvironment) -> None:
+        self.tokens: list[Token] = []
+        self.calls: dict[int, Token] = {}
+        self.__pending_calls: list[Token] = []
+        self.constants: list[Any] = []
+        self.__globals = globals_
+        self.__global_cells: dict[str, str] = {}
+        self.__analyzer = _ScopeAnalyzer()
+        self.__lines: list[str] = []
+        self.__indent = 0
+        self.__temps = itertools.count()
+        self.__functions = itertools.count()
+        self.__this: str | None = None
+
+    def transpile(self, statements: list[s.Stmt | None]) -> str:
+        self.__analyzer.analyze(statements)
+        self.__emit(f"def {ENTRY_POINT}():")
+        with self.__suite():
+            self.__statements(statements)
+        return "\n".join(self.__lines) + "\n"
+
+    def __emit(self, line: str) -> None:
+        self.__lines.append("    " * self.__indent + line)
+        if self.__pending_calls:
+            # With nested calls on one line, the outermost is the one most likely to recurse.
+            self.calls[len(self.__lines)] = self.__pending_calls[-1]
+            self.__pending_calls.clear()
+
+    @contextmanager
+    def __suite(self) -> Generator[None, None, None]:
+        try:
+            self.__indent += 1
+            start = len(self.__lines)
+            yield
+        finally:
+            if len(self.__lines) == start:
+                self.__emit("pass")
+            self.__indent -= 1
+
+    def __statements(self, statements: list[s.Stmt | None] | list[s.Stmt]) -> None:
+        for stmt in statements:
+            if stmt is not None:
+                stmt.accept(self)
+
+    def __token(self, token: Token) -> str:
+        self.tokens.append(token)
+        return f"_T[{len(self.tokens) - 1}]"
+
+    def __property_cache(self, name: Token) -> str:
+        self.constants.append(PropertyCache(name))
+        return f"_K[{len(self.constants) - 1}]"
+
+    def __global(self, lexeme: str) -> str:
+        if (cell := self.__global_cells.get(lexeme)) is None:
+            self.constants.append(self.__globals.cell(lexeme))
+            cell = self.__global_cells[lexeme] = f"_K[{len(self.constants) - 1}]"
+        return cell
+
+    def __temp(self) -> str:
+        return f"_t{next(self.__temps)}"
+
+    def __expression(self, expr: e.Expr) -> str:
+        return expr.accept(self)
+
+    def __condition(self, expr: e.Expr) -> str:
+        while isinstance(expr, e.Grouping):
+            expr = expr.expression
+        if isinstance(expr, e.Binary) and expr.operator.type_ in BOOLEAN_OPERATORS:
+            return self.__expression(expr)
+        if isinstance(expr, e.Unary) and expr.operator.type_ == TokenType.BANG:
+            return self.__expression(expr)
+        if isinstance(expr, e.Literal) and isinstance(expr.value, bool):
+            return repr(expr.value)
+        temp = self.__temp()
+        return f"({temp} := {self.__expression(expr)}) is not None and {temp} is not False"
+
+    @staticmethod
+    def __read(binding: _Binding) -> str:
+        return f"{binding.name}[0]" if binding.captured else binding.name
+
+    def __define(self, node: object, lexeme: str, value: str) -> None:
+        if (binding := self.__analyzer.declarations.get(id(node))) is None:
+            self.__emit(f"{self.__global(lexeme)}.value = {value}")
+        elif binding.captured:
+            self.__emit(f"{binding.name} = [{value}]")
+        else:
+            self.__emit(f"{binding.name} = {value}")
+
+    def __function(self, stmt: s.Function, is_method: bool) -> str:
+        raw = f"_fn{next(self.__functions)}_{stmt.name.lexeme}"
+        analyzer = self.__analyzer
+        info = analyzer.functions[id(stmt)]
+        is_initializer = is_method and stmt.name.lexeme == "init"
+
+        params = [analyzer.declarations[id(param)] for param in stmt.params]
+        if is_method:
+            params.insert(0, analyzer.declarations[id(stmt.name)])
+        signature = [param.name for param in params]
+        if info.free:
+            signature.append("*")
+            signature.extend(f"{binding.name}={binding.name}" for binding in info.free)
+
+        enclosing_this = self.__this
+        self.__this = self.__read(params[0]) if is_initializer else None
+        self.__emit(f"def {raw}({', '.join(signature)}):")
+        with self.__suite():
+            for param in params:
+                if param.captured:
+                    self.__emit(f"{param.name} = [{param.name}]")
+            self.__statements(stmt.body)
+            if is_initializer:
+                self.__emit(f"return {self.__this}")
+        self.__this = enclosing_this
+
+        return f"_function({raw}, {stmt.name.lexeme!r}, {len(stmt.params)}, {is_initializer})"
+
+    def visit_expression(self, stmt: s.Expression) -> None:
+        self.__emit(self.__expression(stmt.expression))
+
+    def visit_print(self, stmt: s.Print) -> None:
+        self.__emit(f"_print({self.__expression(stmt.expression)})")
+
+    def visit_var(self, stmt: s.Var) -> None:
+        value = "None" if stmt.initializer is None else self.__expression(stmt.initializer)
+        self.__define(stmt, stmt.name.lexeme, value)
+
+    def visit_block(self, stmt: s.Block) -> None:
+        self.__statements(stmt.statments)
+
+    def visit_if(self, stmt: s.If) -> None:
+        self.__emit(f"if {self.__condition(stmt.condition)}:")
+        with self.__suite():
+            stmt.then_branch.accept(self)
+        if stmt.else_branch is not None:
+            self.__emit("else:")
+            with self.__suite():
+                stmt.else_branch.accept(self)
+
+    def visit_while(self, stmt: s.While) -> None:
+        self.__emit(f"while {self.__condition(stmt.condition)}:")
+        with self.__suite():
+            stmt.body.accept(self)
+
+    def visit_for(self, stmt: s.For) -> None:
+        if stmt.initializer is not None:
+            stmt.initializer.accept(self)
+        self.__emit(f"while {'True' if stmt.condition is None else self.__condition(stmt.condition)}:")
+        with self.__suite():
+            stmt.body.accept(self)
+            if stmt.increment is not None:
+                self.__emit(self.__expression(stmt.increment))
+
+    def visit_function(self, stmt: s.Function) -> None:
+        binding = self.__analyzer.declarations.get(id(stmt))
+        if binding is not None and binding.captured:
+            # The function can refer to itself, so its cell must exist before the def binds it.
+            self.__emit(f"{binding.name} = [None]")
+            value = self.__function(stmt, is_method=False)
+            self.__emit(f"{binding.name}[0] = {value}")
+        else:
+            self.__define(stmt, stmt.name.lexeme, self.__function(stmt, is_method=False))
+
+    def visit_return(self, stmt: s.Return) -> None:
+        if self.__this is not None:
+            self.__emit(f"return {self.__this}")
+        elif stmt.value is None:
+            self.__emit("return None")
+        else:
+            self.__emit(f"return {self.__expression(stmt.value)}")
+
+    def visit_class(self, stmt: s.Class) -> None:
+        self.__define(stmt, stmt.name.lexeme, "None")
+        methods = [f"{method.name.lexeme!r}: {self.__function(method, is_method=True)}" for method in stmt.methods]
+        klass = f"_class({stmt.name.lexeme!r}, {{{', '.join(methods)}}})"
+        self.__emit(self.__assign(stmt.name, self.__analyzer.declarations.get(id(stmt)), klass))
+
+    def visit_literal(self, expr: e.Literal) -> str:
+        value = expr.value
+        if value is None or isinstance(value, (bool, str)) or (isinstance(value, float) and math.isfinite(value)):
+            return repr(value)
+        self.constants.append(value)
+        return f"_K[{len(self.constants) - 1}]"
+
+    def visit_grouping(self, expr: e.Grouping) -> str:
+        return self.__expression(expr.expression)
+
+    def visit_unary(self, expr: e.Unary) -> str:
+        right = self.__expression(expr.right)
+        temp = self.__temp()
+        match expr.operator.type_:
+            case TokenType.BANG:
+                return f"(({temp} := {right}) is None or {temp} is False)"
+            case TokenType.MINUS:
+                error = f'_error({self.__token(expr.operator)}, "Operand must be a number.")'
+                return f"(-{temp} if type({temp} := {right}) is float else {error})"
+        return f"({right}, None)[1]"
+
+    def visit_binary(self, expr: e.Binary) -> str:
+        left = self.__expression(expr.left)
+        right = self.__expression(expr.right)
+        type_ = expr.operator.type_
+
+        if type_ == TokenType.EQUAL_EQUAL:
+            return f"({left} == {right})"
+        if type_ == TokenType.BANG_EQUAL:
+            return f"({left} != {right})"
+
+        a, b = self.__temp(), self.__temp()
+        operands = f"type({a} := {left}) is type({b} := {right})"
+        if type_ == TokenType.PLUS:
+            return f"({a} + {b} if {operands} is float else _add({a}, {b}, {self.__token(expr.operator)}))"
+        if (operator := NUMERIC_OPERATORS.get(type_)) is not None:
+            error = f'_error({self.__token(expr.operator)}, "Operands must be numbers.")'
+            return f"({a} {operator} {b} if {operands} is float else {error})"
+        return f"({left}, {right}, None)[2]"
+
+    def visit_logical(self, expr: e.Logical) -> str:
+        left = self.__expression(expr.left)
+        right = self.__expression(expr.right)
+        temp = self.__temp()
+        if expr.operator.type_ == TokenType.OR:
+            return f"({temp} if ({temp} := {left}) is not None and {temp} is not False else {right})"
+        return f"({temp} if ({temp} := {left}) is None or {temp} is False else {right})"
+
+    def __variable(self, expr: e.Expr, name: Token) -> str:
+        if (binding := self.__analyzer.references[id(expr)]) is not None:
+            return self.__read(binding)
+        temp = self.__temp()
+        cell = self.__global(name.lexeme)
+        return f"({temp} if ({temp} := {cell}.value) is not _UNDEFINED else _undefined({self.__token(name)}))"
+
+    def visit_variable(self, expr: e.Variable) -> str:
+        return self.__variable(expr, expr.name)
+
+    def __assign(self, name: Token, binding: _Binding | None, value: str) -> str:
+        if binding is None:
+            return f"_assign_global({self.__global(name.lexeme)}, {self.__token(name)}, {value})"
+        if binding.captured:
+            return f"_assign_cell({binding.name}, {value})"
+        return f"({binding.name} := {value})"
+
+    def visit_assign(self, expr: e.Assign) -> str:
+        value = self.__expression(expr.value)
+        return self.__assign(expr.name, self.__analyzer.references[id(expr)], value)
+
+    def visit_call(self, expr: e.Call) -> str:
+        count = len(expr.arguments)
+        if isinstance(expr.callee, e.Get):
+            # `obj.m(x)` passes `obj` to the method's function itself, so no bound method is made.
+            obj, value = self.__temp(), self.__expression(expr.callee.obj)
+            cache = self.__property_cache(expr.callee.name)
+            callee = f"_method(({obj} := {value}), {cache}, {self.__token(expr.paren)}, {count})"
+            arguments = ", ".join([obj, *(self.__expression(argument) for argument in expr.arguments)])
+        else:
+            callee = f"_callable({self.__expression(expr.callee)}, {self.__token(expr.paren)}, {count})"
+            arguments = ", ".join(self.__expression(argument) for argument in expr.arguments)
+        self.__pending_calls.append(expr.paren)
+        return f"{callee}({arguments})"
+
+    def visit_get(self, expr: e.Get) -> str:
+        return f"_get({self.__expression(expr.obj)}, {self.__property_cache(expr.name)})"
+
+    def visit_set(self, expr: e.Set) -> str:
+        obj = f"_instance({self.__expression(expr.obj)}, {self.__token(expr.name)})"
+        return f"_set({obj}, {self.__property_cache(expr.name)}, {self.__expression(expr.value)})"
+
+    def visit_this(self, expr: e.This) -> str:
+        return self.__variable(expr, expr.keyword)
+
+
+def _error(token: Token, message: str) -> Any:
+    raise LoxRuntimeError(token, message)
+
+
+def _add(a: Any, b: Any, token: Token) -> Any:
+    if isinstance(a, STRING_TYPES) and isinstance(b, STRING_TYPES):
+        return concat(a, b)
+    raise LoxRuntimeError(token, "Operands must be two numbers or two strings.")
+
+
+def _assign_cell(cell: list[Any], value: Any) -> Any:
+    cell[0] = value
+    return value
+
+
+def _get(obj: Any, cache: PropertyCache) -> Any:
+    if isinstance(obj, LoxInstance):
+        return cache.get(obj)
+    raise LoxRuntimeError(cache.name, "Only instances have properties.")
+
+
+def _instance(obj: Any, name: Token) -> LoxInstance:
+    if isinstance(obj, LoxInstance):
+        return obj
+    raise LoxRuntimeError(name, "Only instances have fields.")
+
+
+def _set(instance: LoxInstance, cache: PropertyCache, value: Any) -> Any:
+    cache.set(instance, value)
+    return value
+
+
+class PythonInterpreter(Interpreter):
+    """Backend that runs programs as CPython bytecode via `Transpiler`.
+
+    Set `dump_path` to have every generated module written out for inspection.
+    """
+
+    supports_hooks = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.dump_path: Path | None = None
+        self.__dumps = 0
+        self.__namespace = self.__runtime()
+
+    def interpret(self, statements: list[s.Stmt | None]) -> None:
+        transpiler = Transpiler(self.globals)
+        source = transpiler.transpile(statements)
+        self.__dump(source)
+
+        try:
+            code = compile(source, "<lox>", "exec")
+        except (SyntaxError, RecursionError):
+            # CPython caps how deeply blocks may nest; such programs still run on the tree-walker.
+            super().interpret(statements)
+            return
+
+        namespace = dict(self.__namespace, _T=transpiler.tokens, _K=transpiler.constants)
+        exec(code, namespace)  # pylint: disable=exec-used
+        try:
+            namespace[ENTRY_POINT]()
+        except LoxRuntimeError as error:
+            self.output.flush()
+            handler.runtime_error(error)
+        except RecursionError as error:
+            if not transpiler.calls:
+                raise
+            self.output.flush()
+            handler.runtime_error(LoxRuntimeError(self.__overflowing_call(error, transpiler.calls), "Stack overflow."))
+        finally:
+            self.output.flush()
+
+    @staticmethod
+    def __overflowing_call(error: RecursionError, calls: dict[int, Token]) -> Token:
+        """The innermost Lox call on the traceback of `error`."""
+        token = next(iter(calls.values()))
+        traceback = error.__traceback__
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == "<lox>" and traceback.tb_lineno in calls:
+                token = calls[traceback.tb_lineno]
+            traceback = traceback.tb_next
+        return token
+
+    def __dump(self, source: str) -> None:
+        if self.dump_path is None:
+            return
+        with self.dump_path.open("a" if self.__dumps else "w", encoding="utf-8") as file:
+            file.write(source)
+        self.__dumps += 1
+
+    def __runtime(self) -> dict[str, Any]:
+        def undefined_(name: Token) -> Any:
+            raise undefined(name)
+
+        def assign_global(cell: Cell, name: Token, value: Any) -> Any:
+            if cell.value is UNDEFINED:
+                raise undefined(name)
+            cell.value = value
+            return value
+
+        def print_(value: Any) -> None:
+            self.output.write_line(stringify(value))
+
+        def callable_(callee: Any, paren: Token, count: int) -> Callable[..., Any]:
+            if type(callee) is PythonFunction:  # pylint: disable=unidiomatic-typecheck
+                if callee.arity == count:
+                    return callee.fn
+            elif not isinstance(callee, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+
+            arity = callee.arity
+
+            def call(*arguments: Any) -> Any:
+                # Arity errors are raised only after the arguments have been evaluated.
+                if arity != count:
+                    raise LoxRuntimeError(paren, f"Expected {arity} arguments but got {count}.")
+                return callee(self, list(arguments))
+
+            return call
+
+        def method_(obj: Any, cache: PropertyCache, paren: Token, count: int) -> Callable[..., Any]:
+            # The result is called with `obj` followed by the arguments.
+            if not isinstance(obj, LoxInstance):
+                raise LoxRuntimeError(cache.name, "Only instances have properties.")
+            if (method := cache.method_for(obj)) is None:
+                function = callable_(cache.get(obj), paren, count)
+                return lambda _, *arguments: function(*arguments)
+            if isinstance(method, PythonFunction) and method.arity == count:
+                return method.raw
+            arity = method.arity
+
+            def call(receiver: LoxInstance, *arguments: Any) -> Any:
+                if arity != count:
+                    raise LoxRuntimeError(paren, f"Expected {arity} arguments but got {count}.")
+                return method.call_method(self, receiver, list(arguments))
+
+            return call
+
+        return {
+            "__builtins__": {"type": type, "float": float, "str": str},
+            "_UNDEFINED": UNDEFINED,
+            "_error": _error,
+            "_add": _add,
+            "_print": print_,
+            "_undefined": undefined_,
+            "_assign_global": assign_global,
+            "_assign_cell": _assign_cell,
+            "_callable": callable_,
+            "_get": _get,
+            "_method": method_,
+            "_instance": _instance,
+            "_set": _set,
+            "_function": PythonFunction,
+            "_class": LoxClass,
+        }
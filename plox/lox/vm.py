@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+from typing import Any
+
+import lox.stmt as s
+from lox.chunk import FunctionProto, OpCode
+from lox.compiler import Compiler
+from lox.errors import LoxRuntimeError, handler
+from lox.interpreter import Interpreter
+from lox.lox_callable import LoxCallable
+from lox.lox_class import LoxClass, LoxInstance
+from lox.runtime import STRING_TYPES, concat, is_equal, is_truthy, stringify
+
+FRAMES_MAX = 1024
+
+CONSTANT = int(OpCode.CONSTANT)
+NIL = int(OpCode.NIL)
+TRUE = int(OpCode.TRUE)
+FALSE = int(OpCode.FALSE)
+POP = int(OpCode.POP)
+GET_LOCAL = int(OpCode.GET_LOCAL)
+SET_LOCAL = int(OpCode.SET_LOCAL)
+GET_GLOBAL = int(OpCode.GET_GLOBAL)
+DEFINE_GLOBAL = int(OpCode.DEFINE_GLOBAL)
+SET_GLOBAL = int(OpCode.SET_GLOBAL)
+GET_UPVALUE = int(OpCode.GET_UPVALUE)
+SET_UPVALUE = int(OpCode.SET_UPVALUE)
+GET_PROPERTY = int(OpCode.GET_PROPERTY)
+SET_PROPERTY = int(OpCode.SET_PROPERTY)
+EQUAL = int(OpCode.EQUAL)
+NOT_EQUAL = int(OpCode.NOT_EQUAL)
+GREATER = int(OpCode.GREATER)
+GREATER_EQUAL = int(OpCode.GREATER_EQUAL)
+LESS = int(OpCode.LESS)
+LESS_EQUAL = int(OpCode.LESS_EQUAL)
+ADD = int(OpCode.ADD)
+SUBTRACT = int(OpCode.SUBTRACT)
+MULTIPLY = int(OpCode.MULTIPLY)
+DIVIDE = int(OpCode.DIVIDE)
+NOT = int(OpCode.NOT)
+NEGATE = int(OpCode.NEGATE)
+PRINT = int(OpCode.PRINT)
+JUMP = int(OpCode.JUMP)
+JUMP_IF_FALSE = int(OpCode.JUMP_IF_FALSE)
+LOOP = int(OpCode.LOOP)
+CHECK_CALLABLE = int(OpCode.CHECK_CALLABLE)
+CHECK_INSTANCE = int(OpCode.CHECK_INSTANCE)
+CALL = int(OpCode.CALL)
+CLOSURE = int(OpCode.CLOSURE)
+CLOSE_UPVALUE = int(OpCode.CLOSE_UPVALUE)
+RETURN = int(OpCode.RETURN)
+CLASS = int(OpCode.CLASS)
+GET_CALLEE = int(OpCode.GET_CALLEE)
+TAIL_CALL = int(OpCode.TAIL_CALL)
+INVOKE = int(OpCode.INVOKE)
+TAIL_INVOKE = int(OpCode.TAIL_INVOKE)
+
+
+class Upvalue:
+    """A captured variable.
+
+    While open, `cells` is the VM stack and `index` the absolute slot of the variable. Closing it moves the value into
+    a private one-element list, so reads and writes are `cells[index]` either way.
+    """
+
+    __slots__ = ("cells", "index")
+
+    def __init__(self, cells: list[Any], index: int) -> None:
+        self.cells = cells
+        self.index = index
+
+
+class Closure(LoxCallable):
+    __slots__ = ("function", "upvalues", "arity")
+
+    def __init__(self, function: FunctionProto, upvalues: list[Upvalue]) -> None:
+        self.function = function
+        self.upvalues = upvalues
+        self.arity = function.arity
+
+    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
+        assert isinstance(interpreter, VM)
+        return interpreter.call(self, arguments)
+
+    def bind(self, instance: LoxInstance) -> BoundMethod:
+        return BoundMethod(instance, self)
+
+    def __str__(self) -> str:
+        return str(self.function)
+
+
+class BoundMethod(LoxCallable):
+    __slots__ = ("receiver", "method", "arity")
+
+    def __init__(self, receiver: LoxInstance, method: Closure) -> None:
+        self.receiver = receiver
+        self.method = method
+        self.arity = method.arity
+
+    def __call__(self, interpreter: Interpreter, arguments: list[Any]) -> Any:
+        assert isinstance(interpreter, VM)
+        return interpreter.call(self, arguments)
+
+    def __str__(self) -> str:
+        return str(self.method)
+
+
+class _CallFrame:
+    __slots__ = ("closure", "ip", "base")
+
+    def __init__(self, closure: Closure, base: int) -> None:
+        self.closure = closure
+        self.ip = 0
+        self.base = base
+
+
+class VM(Interpreter):
+    """Bytecode backend.
+
+    Runs the program produced by `Compiler` on a value stack. Globals live in the same `Environment` the tree-walker
+    uses, and classes and instances are the same `LoxClass`/`LoxInstance` objects, so printed values and runtime errors
+    are identical between the two backends.
+    """
+
+    supports_hooks = False
+
+    def __init__(self, frames_max: int = FRAMES_MAX) -> None:
+        super().__init__()
+        self.frames_max = frames_max
+        self.__stack: list[Any] = []
+        self.__frames: list[_CallFrame] = []
+        self.__open_upvalues: dict[int, Upvalue] = {}
+
+    def interpret(self, statements: list[s.Stmt | None]) -> None:
+        function = Compiler().compile(statements)
+        closure = Closure(function, [])
+        try:
+            self.call(closure, [])
+        except LoxRuntimeError as error:
+            self.__stack.clear()
+            self.__frames.clear()
+            self.__open_upvalues.clear()
+            self.output.flush()
+            handler.runtime_error(error)
+        finally:
+            self.output.flush()
+
+    def call(self, callee: Closure | BoundMethod, arguments: list[Any]) -> Any:
+        """Runs a compiled function to completion; used for the entry point and for calls made from Python."""
+        stack = self.__stack
+        base = len(stack)
+        if isinstance(callee, BoundMethod):
+            stack.append(callee.receiver)
+            callee = callee.method
+        else:
+            stack.append(callee)
+        stack.extend(arguments)
+        self.__frames.append(_CallFrame(callee, base))
+        return self.__run(len(self.__frames) - 1)
+
+    def __capture_upvalue(self, index: int) -> Upvalue:
+        if (upvalue := self.__open_upvalues.get(index)) is None:
+            upvalue = self.__open_upvalues[index] = Upvalue(self.__stack, index)
+        return upvalue
+
+    def __close_upvalues(self, last: int) -> None:
+        stack = self.__stack
+        for index in [index for index in self.__open_upvalues if index >= last]:
+            upvalue = self.__open_upvalues.pop(index)
+            upvalue.cells = [stack[index]]
+            upvalue.index = 0
+
+    def __run(self, exit_depth: int) -> Any:  # pylint: disable=too-many-branches,too-many-statements
+        stack = self.__stack
+        frames = self.__frames
+        globals_ = self.globals
+        frames_max = self.frames_max
+        write_line = self.output.write_line
+
+        frame = frames[-1]
+        function = frame.closure.function
+        code = function.chunk.code
+        constants = function.chunk.constants
+        upvalues = frame.closure.upvalues
+        base = frame.base
+        ip = 0
+
+        def error(message: str) -> LoxRuntimeError:
+            return LoxRuntimeError(function.chunk.tokens[ip - 1], message)
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                stack.append(stack[base + code[ip]])
+                ip += 1
+            elif op == CONSTANT:
+                stack.append(constants[code[ip]])
+                ip += 1
+            elif op == POP:
+                stack.pop()
+            elif op == GET_GLOBAL:
+                stack.append(globals_.get(constants[code[ip]]))
+                ip += 1
+            elif op == JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip = code[ip]
+                else:
+                    ip += 1
+            elif op == JUMP:
+                ip = code[ip]
+            elif op == LOOP:
+                ip = code[ip]
+            elif op == SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+            elif op == GET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                stack.append(upvalue.cells[upvalue.index])
+                ip += 1
+            elif op == SET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                upvalue.cells[upvalue.index] = stack[-1]
+                ip += 1
+            elif op == LESS or op == LESS_EQUAL or op == GREATER or op == GREATER_EQUAL:
+                right = stack.pop()
+                left = stack[-1]
+                if not (isinstance(left, float) and isinstance(right, float)):
+                    raise error("Operands must be numbers.")
+                if op == LESS:
+                    stack[-1] = left < right
+                elif op == LESS_EQUAL:
+                    stack[-1] = left <= right
+                elif op == GREATER:
+                    stack[-1] = left > right
+                else:
+                    stack[-1] = left >= right
+            elif op == ADD:
+                right = stack.pop()
+                left = stack[-1]
+                if isinstance(left, float) and isinstance(right, float):
+                    stack[-1] = left + right
+                elif isinstance(left, STRING_TYPES) and isinstance(right, STRING_TYPES):
+                    stack[-1] = concat(left, right)
+                else:
+                    raise error("Operands must be two numbers or two strings.")
+            elif op == SUBTRACT or op == MULTIPLY or op == DIVIDE:
+                right = stack.pop()
+                left = stack[-1]
+                if not (isinstance(left, float) and isinstance(right, float)):
+                    raise error("Operands must be numbers.")
+                if op == SUBTRACT:
+                    stack[-1] = left - right
+                elif op == MULTIPLY:
+                    stack[-1] = left * right
+                else:
+                    stack[-1] = left / right
+            elif op == CALL or op >= TAIL_CALL:  # TAIL_CALL, INVOKE and TAIL_INVOKE are the last opcodes
+                arg_count = code[ip]
+                if op >= INVOKE:
+                    # GET_CALLEE pushed the callee above its slot, which already holds the receiver or the callee.
+                    callee = stack.pop(-1 - arg_count)
+                else:
+                    callee = stack[-1 - arg_count]
+                if isinstance(callee, BoundMethod):
+                    stack[-1 - arg_count] = callee.receiver
+                    callee = callee.method
+                elif isinstance(callee, LoxClass):
+                    stack[-1 - arg_count] = LoxInstance(callee)
+                    if (initializer := callee.initializer) is None:
+                        if arg_count != 0:
+                            raise error(f"Expected 0 arguments but got {arg_count}.")
+                        ip += 1
+                        continue
+                    callee = initializer
+
+                if isinstance(callee, Closure):
+                    if arg_count != callee.arity:
+                        raise error(f"Expected {callee.arity} arguments but got {arg_count}.")
+                    if op == TAIL_CALL or op == TAIL_INVOKE:
+                        # The caller's frame is finished: close its upvalues and let the callee take over its slots.
+                        if self.__open_upvalues:
+                            self.__close_upvalues(base)
+                        stack[base:] = stack[len(stack) - arg_count - 1 :]
+                        frame.closure = callee
+                    else:
+                        if len(frames) == frames_max:
+                            raise error("Stack overflow.")
+                        frame.ip = ip + 1
+                        frame = _CallFrame(callee, len(stack) - arg_count - 1)
+                        frames.append(frame)
+                    function = callee.function
+                    code = function.chunk.code
+                    constants = function.chunk.constants
+                    upvalues = callee.upvalues
+                    base = frame.base
+                    ip = 0
+                elif isinstance(callee, LoxCallable):
+                    if arg_count != callee.arity:
+                        raise error(f"Expected {callee.arity} arguments but got {arg_count}.")
+                    ip += 1
+                    arguments = stack[len(stack) - arg_count :]
+                    del stack[len(stack) - arg_count - 1 :]
+                    stack.append(callee(self, arguments))
+                else:
+                    raise error("Can only call functions and classes.")
+            elif op == RETURN:
+                result = stack.pop()
+                if self.__open_upvalues:
+                    self.__close_upvalues(base)
+                del stack[base:]
+                frames.pop()
+                if len(frames) == exit_depth:
+                    return result
+                stack.append(result)
+                frame = frames[-1]
+                function = frame.closure.function
+                code = function.chunk.code
+                constants = function.chunk.constants
+                upvalues = frame.closure.upvalues
+                base = frame.base
+                ip = frame.ip
+            elif op == NIL:
+                stack.append(None)
+            elif op == TRUE:
+                stack.append(True)
+            elif op == FALSE:
+                stack.append(False)
+            elif op == SET_GLOBAL:
+                globals_.assign(constants[code[ip]], stack[-1])
+                ip += 1
+            elif op == DEFINE_GLOBAL:
+                globals_.define(constants[code[ip]].lexeme, stack.pop())
+                ip += 1
+            elif op == GET_PROPERTY:
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise error("Only instances have properties.")
+                stack[-1] = constants[code[ip]].get(instance)
+                ip += 1
+            elif op == GET_CALLEE:
+                # Leaves the instance as the receiver and pushes the method, unbound; a field's value is pushed in
+                # place of the instance as well, so INVOKE then calls it exactly as CALL would.
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise error("Only instances have properties.")
+                cache = constants[code[ip]]
+                # The cache's hit path, inlined: the shape it last saw, naming a method.
+                if instance.shape is not cache.shape or (method := cache.method) is None:
+                    if (method := cache.method_for(instance)) is None:
+                        stack[-1] = method = cache.get(instance)
+                stack.append(method)
+                ip += 1
+            elif op == CHECK_INSTANCE:
+                if not isinstance(stack[-1], LoxInstance):
+                    raise error("Only instances have fields.")
+            elif op == SET_PROPERTY:
+                value = stack.pop()
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise error("Only instances have fields.")
+                constants[code[ip]].set(instance, value)
+                stack[-1] = value
+                ip += 1
+            elif op == EQUAL:
+                right = stack.pop()
+                stack[-1] = is_equal(stack[-1], right)
+            elif op == NOT_EQUAL:
+                right = stack.pop()
+                stack[-1] = not is_equal(stack[-1], right)
+            elif op == NOT:
+                stack[-1] = not is_truthy(stack[-1])
+            elif op == NEGATE:
+                if not isinstance(stack[-1], float):
+                    raise error("Operand must be a number.")
+                stack[-1] = -stack[-1]
+            elif op == PRINT:
+                write_line(stringify(stack.pop()))
+            elif op == CHECK_CALLABLE:
+                callee = stack[-1]
+                if not isinstance(callee, LoxCallable):
+                    raise error("Can only call functions and classes.")
+            elif op == CLOSURE:
+                proto: FunctionProto = constants[code[ip]]
+                ip += 1
+                captured = []
+                for _ in range(proto.upvalue_count):
+                    if code[ip]:
+                        captured.append(self.__capture_upvalue(base + code[ip + 1]))
+                    else:
+                        captured.append(upvalues[code[ip + 1]])
+                    ip += 2
+                stack.append(Closure(proto, captured))
+            elif op == CLOSE_UPVALUE:
+                self.__close_upvalues(len(stack) - 1)
+                stack.pop()
+            elif op == CLASS:
+                name = constants[code[ip]]
+                method_count = code[ip + 1]
+                ip += 2
+                methods: dict[str, Closure] = {}
+                if method_count:
+                    for method in stack[len(stack) - method_count :]:
+                        methods[method.function.name] = method
+                    del stack[len(stack) - method_count :]
+                stack.append(LoxClass(name, methods))  # type: ignore[arg-type]
+            else:
+                raise RuntimeError(f"Unknown opcode {op}.")
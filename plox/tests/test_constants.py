@@ -0,0 +1,24 @@
+import contextlib
+import io
+
+import pytest
+
+from lox.errors import handler
+from lox.main import BACKENDS, run
+
+SOURCE = """
+print 0;
+print -0;
+print 0 * -1;
+print -0 == 0;
+"""
+
+
+@pytest.mark.parametrize("opt_level", range(3))
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_negative_zero_keeps_its_sign(backend: str, opt_level: int) -> None:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        run(SOURCE, BACKENDS[backend](), opt_level=opt_level)
+    assert not handler.had_error and not handler.had_runtime_error
+    assert output.getvalue() == "0\n-0\n-0\nTrue\n"